@@ -6,7 +6,12 @@ set -e
 
 git pull
 source venv/bin/activate
+python manage.py check --deploy --fail-level ERROR
 python manage.py migrate --noinput
+python manage.py createcachetable
+python manage.py geocode_addresses
+python manage.py rebuild_order_candidates
+python manage.py copy_banner_images
 npm ci
 ./node_modules/.bin/parcel bundles-src/index.js --dist-dir bundles --public-url="./"
 
@@ -15,6 +20,7 @@ python manage.py collectstatic --noinput
 deactivate
 
 sudo systemctl restart burger
+sudo systemctl restart burger-geocoder
 sudo systemctl reload nginx
 
 last_commit=$(git rev-parse HEAD);
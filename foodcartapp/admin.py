@@ -1,23 +1,36 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.core.exceptions import ValidationError
 from django.db.models import Sum
 from django.http import HttpResponseRedirect
-from django.shortcuts import reverse
+from django.shortcuts import render, reverse
+from django.urls import path
 from django.templatetags.static import static
 from django.utils.html import format_html
 
-from .models import Product, Place
+from .candidates import defer_candidate_updates
+from .geocoding import enqueue_geocoding
+from .loads import get_restaurant_in_flight_orders
+from .menu_import import IMPORT_FORMATS, import_menu_availability, read_menu_file
+from .models import Banner, Product, Place
 from .models import ProductCategory
 from .models import Restaurant
 from .models import RestaurantMenuItem
 
 from .models import Order
 from .models import OrderItem
+from .models import ArchivedOrder, ArchivedOrderItem
+from .summaries import defer_order_summaries
 
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
 
+    def get_queryset(self, request):
+        # __str__ позиции выводится в каждой строке и обращается к заказу и продукту
+        return super().get_queryset(request).select_related('order', 'product')
+
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
@@ -35,7 +48,17 @@ class OrderAdmin(admin.ModelAdmin):
         OrderItemInline
     ]
 
-    readonly_fields = ['registration_date']
+    readonly_fields = ['registration_date', 'place', 'items_count', 'product_ids']
+
+    def save_model(self, request, obj, form, change):
+        if 'address' in form.changed_data:
+            enqueue_geocoding([obj])
+        super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        # сводка и кандидаты заказа пересчитываются один раз, а не на каждую позицию инлайна
+        with defer_order_summaries(), defer_candidate_updates():
+            super().save_related(request, form, formsets, change)
 
     def response_change(self, request, obj):
         res = super(OrderAdmin, self).response_post_save_change(request, obj)
@@ -45,13 +68,67 @@ class OrderAdmin(admin.ModelAdmin):
             return res
 
 
+class ReadOnlyAdminMixin:
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class ArchivedOrderItemInline(ReadOnlyAdminMixin, admin.TabularInline):
+    model = ArchivedOrderItem
+    extra = 0
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
+    search_fields = [
+        'firstname',
+        'lastname',
+        'phonenumber',
+    ]
+    list_display = [
+        'id',
+        'firstname',
+        'lastname',
+        'phonenumber',
+        'total_price',
+        'registration_date',
+    ]
+    date_hierarchy = 'registration_date'
+    inlines = [
+        ArchivedOrderItemInline
+    ]
+
+
 class RestaurantMenuItemInline(admin.TabularInline):
     model = RestaurantMenuItem
     extra = 0
 
+    def get_queryset(self, request):
+        # __str__ пункта меню выводится в каждой строке и обращается к ресторану и продукту
+        return super().get_queryset(request).select_related('restaurant', 'product')
+
+
+class MenuImportForm(forms.Form):
+    file = forms.FileField(
+        label='Файл',
+        help_text='CSV с колонками restaurant, product, availability (id ресторана, id продукта, 1 или 0) '
+                  'или JSON-список объектов с такими же ключами',
+    )
+    format = forms.ChoiceField(label='Формат', choices=[(name, name.upper()) for name in IMPORT_FORMATS])
+
 
 @admin.register(Restaurant)
 class RestaurantAdmin(admin.ModelAdmin):
+    change_list_template = 'admin/foodcartapp/restaurant/change_list.html'
     search_fields = [
         'name',
         'address',
@@ -61,10 +138,71 @@ class RestaurantAdmin(admin.ModelAdmin):
         'name',
         'address',
         'contact_phone',
+        'get_in_flight_orders',
+    ]
+    list_select_related = [
+        'load',
     ]
     inlines = [
         RestaurantMenuItemInline
     ]
+    readonly_fields = ['place']
+
+    def save_model(self, request, obj, form, change):
+        if 'address' in form.changed_data:
+            enqueue_geocoding([obj])
+        super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        # кандидаты пересчитываются одним просмотром открытых заказов, а не на каждую строку меню
+        with defer_candidate_updates():
+            super().save_related(request, form, formsets, change)
+
+    def get_urls(self):
+        return [
+            path(
+                'import-menu/',
+                self.admin_site.admin_view(self.import_menu_view),
+                name='foodcartapp_restaurant_import_menu',
+            ),
+        ] + super().get_urls()
+
+    def import_menu_view(self, request):
+        if not self.has_change_permission(request):
+            return HttpResponseRedirect(reverse('admin:index'))
+
+        form = MenuImportForm(request.POST or None, request.FILES or None)
+        if form.is_valid():
+            try:
+                availability = read_menu_file(form.cleaned_data['file'], form.cleaned_data['format'])
+            except ValidationError as error:
+                form.add_error('file', error)
+            else:
+                stats = import_menu_availability(availability)
+                messages.success(
+                    request,
+                    f'Меню обновлено: добавлено {stats["created"]}, изменено {stats["updated"]}, '
+                    f'без изменений {stats["unchanged"]}',
+                )
+                if stats['unknown_restaurants'] or stats['unknown_products']:
+                    messages.warning(
+                        request,
+                        f'Пропущены строки с неизвестными ресторанами {stats["unknown_restaurants"]} '
+                        f'и продуктами {stats["unknown_products"]}',
+                    )
+                return HttpResponseRedirect(reverse('admin:foodcartapp_restaurant_changelist'))
+
+        return render(request, 'admin/foodcartapp/restaurant/import_menu.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Импорт доступности меню',
+            'form': form,
+        })
+
+    def get_in_flight_orders(self, obj):
+        return get_restaurant_in_flight_orders(obj)
+
+    get_in_flight_orders.short_description = 'заказов в работе'
 
 
 @admin.register(Product)
@@ -78,6 +216,9 @@ class ProductAdmin(admin.ModelAdmin):
     list_display_links = [
         'name',
     ]
+    list_select_related = [
+        'category',
+    ]
     list_filter = [
         'category',
     ]
@@ -116,6 +257,11 @@ class ProductAdmin(admin.ModelAdmin):
         'get_image_preview',
     ]
 
+    def save_related(self, request, form, formsets, change):
+        # кандидаты пересчитываются одним просмотром открытых заказов, а не на каждую строку меню
+        with defer_candidate_updates():
+            super().save_related(request, form, formsets, change)
+
     class Media:
         css = {
             "all": (
@@ -148,3 +294,48 @@ class ProductAdmin(admin.ModelAdmin):
 @admin.register(Place)
 class PlaceAdmin(admin.ModelAdmin):
     pass
+
+
+@admin.register(Banner)
+class BannerAdmin(admin.ModelAdmin):
+    list_display = [
+        'get_image_list_preview',
+        'title',
+        'text',
+        'position',
+    ]
+    list_display_links = [
+        'title',
+    ]
+    list_editable = [
+        'position',
+    ]
+    readonly_fields = [
+        'get_image_preview',
+    ]
+
+    def save_related(self, request, form, formsets, change):
+        # кандидаты пересчитываются одним просмотром открытых заказов, а не на каждую строку меню
+        with defer_candidate_updates():
+            super().save_related(request, form, formsets, change)
+    fields = [
+        'title',
+        'text',
+        'image',
+        'get_image_preview',
+        'position',
+    ]
+
+    def get_image_preview(self, obj):
+        if not obj.image:
+            return 'выберите картинку'
+        return format_html('<img src="{url}" style="max-height: 200px;"/>', url=obj.image.url)
+
+    get_image_preview.short_description = 'превью'
+
+    def get_image_list_preview(self, obj):
+        if not obj.image:
+            return 'нет картинки'
+        return format_html('<img src="{src}" style="max-height: 50px;"/>', src=obj.image.url)
+
+    get_image_list_preview.short_description = 'превью'
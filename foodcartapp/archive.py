@@ -0,0 +1,79 @@
+import contextvars
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+
+BATCH_SIZE = 500
+
+_archiving = contextvars.ContextVar('archiving_orders', default=False)
+
+ARCHIVED_ORDER_FIELDS = [
+    'id', 'pay', 'status', 'firstname', 'lastname', 'phonenumber', 'address', 'total_price', 'comment',
+    'registration_date', 'call_date', 'delivery_date', 'restaurant_id', 'place_id', 'items_count', 'product_ids',
+]
+ARCHIVED_ITEM_FIELDS = ['order_id', 'product_id', 'quantity', 'price']
+
+
+def is_archiving():
+    """
+    :return: True, пока удаляются заказы, уже перенесённые в архив. Обработчики удаления
+        заказов и позиций в это время ничего не делают: сводка, кандидаты и строки
+        на странице заказов удаляемым доставленным заказам не нужны.
+    """
+    return _archiving.get()
+
+
+def get_archivable_orders(older_than_days):
+    """
+    :return: доставленные заказы, зарегистрированные больше older_than_days дней назад.
+        Пустой даты регистрации у заказов не бывает с миграции 0012, старые заказы без неё
+        получили ближайшую известную дату.
+    """
+    border = timezone.now() - timedelta(days=older_than_days)
+    return Order.objects.filter(status=Order.READY, registration_date__lt=border)
+
+
+def archive_orders(older_than_days, batch_size=BATCH_SIZE, dry_run=False):
+    """
+    Переносит старые доставленные заказы с позициями в архивные таблицы.
+    Каждая пачка переносится в своей короткой транзакции, поэтому строки заказов
+    блокируются не дольше переноса одной пачки; заказы, заблокированные
+    менеджером, пропускаются до следующего запуска.
+    :return: сколько заказов перенесено, при dry_run — сколько было бы перенесено
+    """
+    orders = get_archivable_orders(older_than_days)
+    if dry_run:
+        return orders.count()
+
+    archived_count = 0
+    while True:
+        with transaction.atomic():
+            batch = orders.order_by('id')
+            if connection.features.has_select_for_update_skip_locked:
+                batch = batch.select_for_update(skip_locked=True)
+            order_ids = list(batch.values_list('id', flat=True)[:batch_size])
+            if not order_ids:
+                break
+            archive_batch(order_ids)
+        archived_count += len(order_ids)
+    return archived_count
+
+
+def archive_batch(order_ids):
+    ArchivedOrder.objects.bulk_create(
+        ArchivedOrder(**fields)
+        for fields in Order.objects.filter(id__in=order_ids).values(*ARCHIVED_ORDER_FIELDS)
+    )
+    ArchivedOrderItem.objects.bulk_create(
+        ArchivedOrderItem(**fields)
+        for fields in OrderItem.objects.filter(order__in=order_ids).values(*ARCHIVED_ITEM_FIELDS)
+    )
+    # заказы удаляются каскадно с позициями и кандидатами
+    token = _archiving.set(True)
+    try:
+        Order.objects.filter(id__in=order_ids).delete()
+    finally:
+        _archiving.reset(token)
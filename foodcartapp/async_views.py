@@ -0,0 +1,64 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseNotAllowed, JsonResponse
+from rest_framework import exceptions, status
+from rest_framework.authentication import SessionAuthentication
+
+from .payloads import banners, product_catalog
+from .serializer import OrderListSerializer, OrderSerializer
+
+# Асинхронные версии публичного API для запуска через ASGI (star_burger/asgi.py).
+# Работа с кэшем и ORM синхронная, она выполняется в потоке через sync_to_async,
+# а цикл событий в это время обслуживает другие запросы.
+
+
+async def banners_list_api(request):
+    return await sync_to_async(banners.get_response)(request)
+
+
+async def product_list_api(request):
+    return await sync_to_async(product_catalog.get_response)(request)
+
+
+def enforce_csrf(request):
+    """
+    Та же проверка, что у SessionAuthentication в DRF: CSRF-токен обязателен
+    только для пользователей, вошедших через сессию
+    """
+    user = request.user
+    if user and user.is_active:
+        SessionAuthentication().enforce_csrf(request)
+
+
+def create_order(order_data):
+    serializer = OrderSerializer(
+        data=order_data,
+        context={'products': OrderListSerializer.prefetch_products([order_data])},
+    )
+    if not serializer.is_valid():
+        return serializer.errors, status.HTTP_400_BAD_REQUEST
+    order = serializer.create(serializer.validated_data)
+    return OrderSerializer(order).data, status.HTTP_200_OK
+
+
+async def register_order(request):
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    try:
+        await sync_to_async(enforce_csrf)(request)
+    except exceptions.PermissionDenied as error:
+        return JsonResponse({'detail': error.detail}, status=status.HTTP_403_FORBIDDEN)
+    try:
+        order_data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'detail': 'Некорректный JSON'}, status=status.HTTP_400_BAD_REQUEST)
+
+    response_data, response_status = await sync_to_async(create_order)(order_data)
+    return JsonResponse(response_data, status=response_status, json_dumps_params={'ensure_ascii': False})
+
+
+# Как и DRF, отключаем CsrfViewMiddleware и проверяем CSRF сами в enforce_csrf:
+# анонимным клиентам API токен не нужен. csrf_exempt в Django 3.2 превращает
+# корутину в обычную функцию, поэтому флаг ставим сами.
+register_order.csrf_exempt = True
@@ -0,0 +1,134 @@
+import random
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .candidates import rebuild_order_candidates
+from .geocoding import geocode_pending
+from .loadtest import summarize_latencies
+from .models import Order, OrderItem, Product, ProductCategory, Restaurant, RestaurantMenuItem
+from .spatial import invalidate_restaurant_index
+from .summaries import set_order_summary
+
+BATCH_SIZE = 1000
+
+
+def get_order_address(number):
+    return f'Москва, ул. Тестовая, д. {number}'
+
+
+def seed_database(restaurants_count, products_count, menu_size, orders_count, addresses_count, seed=0):
+    """
+    Заполняет пустую БД ресторанами, продуктами, меню и заказами.
+    Адреса геокодируются через GEOCODER_URL, для прогона без сети это заглушка geocoder_stub.
+    :param menu_size: сколько продуктов в меню каждого ресторана
+    :param addresses_count: сколько разных адресов доставки у заказов
+    :return: словарь с числом созданных объектов
+    """
+    rng = random.Random(seed)
+    restaurants = Restaurant.objects.bulk_create(
+        Restaurant(name=f'Ресторан {number}', address=f'Москва, ул. Ресторанная, д. {number}')
+        for number in range(restaurants_count)
+    )
+    ProductCategory.objects.bulk_create(
+        ProductCategory(name=f'Категория {number}') for number in range(max(1, products_count // 10))
+    )
+    # без RETURNING (SQLite) bulk_create не проставляет id, а БД заведомо пустая
+    category_ids = list(ProductCategory.objects.values_list('id', flat=True))
+    Product.objects.bulk_create(
+        (
+            Product(
+                name=f'Продукт {number}',
+                category_id=rng.choice(category_ids),
+                price=rng.randint(100, 1000),
+                image='burger.jpg',
+            )
+            for number in range(products_count)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    restaurant_ids = list(Restaurant.objects.values_list('id', flat=True))
+    products = list(Product.objects.only('id', 'price'))
+
+    menu_items = [
+        RestaurantMenuItem(restaurant_id=restaurant_id, product=product, availability=rng.random() < 0.9)
+        for restaurant_id in restaurant_ids
+        for product in rng.sample(products, min(menu_size, len(products)))
+    ]
+    RestaurantMenuItem.objects.bulk_create(menu_items, batch_size=BATCH_SIZE)
+
+    statuses = [status for status, title in Order.ORDER_STATUS]
+    pay_types = [pay for pay, title in Order.PAY_TYPE]
+    orders_products = []
+    orders = []
+    for number in range(orders_count):
+        order_products = rng.sample(products, min(rng.randint(1, 5), len(products)))
+        orders_products.append(order_products)
+        order = Order(
+            firstname='Иван',
+            lastname=f'Покупатель {number}',
+            phonenumber='+79001234567',
+            address=get_order_address(rng.randrange(addresses_count)),
+            status=rng.choice(statuses),
+            pay=rng.choice(pay_types),
+            total_price=sum(product.price for product in order_products),
+        )
+        set_order_summary(order, [product.id for product in order_products])
+        orders.append(order)
+    Order.objects.bulk_create(orders, batch_size=BATCH_SIZE)
+    order_ids = Order.objects.order_by('id').values_list('id', flat=True)
+    items = (
+        OrderItem(order_id=order_id, product=product, quantity=1, price=product.price)
+        for order_id, order_products in zip(order_ids, orders_products)
+        for product in order_products
+    )
+    OrderItem.objects.bulk_create(items, batch_size=BATCH_SIZE)
+
+    geocode_pending(settings.YANDEX_KEY, Restaurant.objects.all(), batch_size=BATCH_SIZE)
+    geocode_pending(settings.YANDEX_KEY, Order.objects.all(), batch_size=BATCH_SIZE)
+    # bulk-операции не отправляют сигналы
+    invalidate_restaurant_index()
+    rebuild_order_candidates()
+
+    return {
+        'restaurants': len(restaurants),
+        'products': len(products),
+        'menu_items': len(menu_items),
+        'orders': len(orders),
+        'order_items': OrderItem.objects.count(),
+    }
+
+
+def measure_requests(client, method, path, requests_count, get_data=None):
+    """
+    Отправляет запросы тестовым клиентом Django по одному
+    :param get_data: функция без аргументов, возвращающая тело очередного запроса
+    :return: сводка summarize_latencies, число ошибок и число SQL-запросов на запрос
+    """
+    latencies = []
+    query_counts = []
+    errors = 0
+    started_at = time.perf_counter()
+    for _ in range(requests_count):
+        data = get_data() if get_data else None
+        request_started_at = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            if method == 'POST':
+                response = client.post(path, data, content_type='application/json')
+            else:
+                response = client.get(path)
+        latencies.append(time.perf_counter() - request_started_at)
+        query_counts.append(len(queries))
+        errors += response.status_code >= 400
+    elapsed = time.perf_counter() - started_at
+
+    summary = summarize_latencies(latencies, elapsed)
+    summary['errors'] = errors
+    summary['queries'] = {
+        'min': min(query_counts, default=0),
+        'max': max(query_counts, default=0),
+        'avg': round(sum(query_counts) / len(query_counts), 1) if query_counts else 0,
+    }
+    return summary
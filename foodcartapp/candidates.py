@@ -0,0 +1,146 @@
+import contextvars
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+
+from foodcartapp.models import Order, OrderCandidate, Restaurant
+from foodcartapp.spatial import get_restaurant_index
+from foodcartapp.summaries import load_product_ids
+
+BATCH_SIZE = 500
+
+_deferred_order_ids = contextvars.ContextVar('deferred_candidate_order_ids', default=None)
+_deferred_product_ids = contextvars.ContextVar('deferred_candidate_product_ids', default=None)
+
+
+def get_order_candidates(restaurant_index, order, product_ids):
+    """
+    :return: список (id ресторана, расстояние в км или None) для заказа без ресторана
+    """
+    if order.place and order.place.coordinates:
+        return restaurant_index.nearest(
+            order.place.coordinates,
+            product_ids,
+            settings.NEAREST_RESTAURANTS_COUNT,
+        )
+    return [(restaurant_id, None) for restaurant_id in restaurant_index.get_capable(product_ids)]
+
+
+def update_order_candidates(order_ids):
+    """
+    Пересчитывает рестораны-кандидаты для заказов. У заказов с назначенным
+    рестораном и доставленных заказов кандидаты удаляются.
+    """
+    order_ids = list(set(order_ids))
+    for start in range(0, len(order_ids), BATCH_SIZE):
+        _update_order_candidates(order_ids[start:start + BATCH_SIZE])
+
+
+def schedule_candidates_update(order_ids):
+    """
+    Пересчитывает кандидатов заказов после коммита,
+    а внутри defer_candidate_updates — одним вызовом при выходе из блока
+    """
+    deferred_order_ids = _deferred_order_ids.get()
+    if deferred_order_ids is None:
+        order_ids = list(order_ids)
+        transaction.on_commit(lambda: update_order_candidates(order_ids))
+    else:
+        deferred_order_ids.update(order_ids)
+
+
+def schedule_candidates_update_for_products(product_ids):
+    """
+    Пересчитывает кандидатов заказов с этими продуктами после коммита,
+    а внутри defer_candidate_updates — одним просмотром открытых заказов при выходе из блока
+    """
+    deferred_product_ids = _deferred_product_ids.get()
+    if deferred_product_ids is None:
+        product_ids = list(product_ids)
+        transaction.on_commit(lambda: update_candidates_for_products(product_ids))
+    else:
+        deferred_product_ids.update(product_ids)
+
+
+@contextmanager
+def defer_candidate_updates():
+    """
+    Собирает заказы и продукты, изменённые в блоке, и пересчитывает кандидатов одним
+    вызовом после коммита, а не по вызову на каждую позицию заказа или строку меню
+    """
+    deferred_order_ids = set()
+    deferred_product_ids = set()
+    order_ids_token = _deferred_order_ids.set(deferred_order_ids)
+    product_ids_token = _deferred_product_ids.set(deferred_product_ids)
+    try:
+        yield
+    finally:
+        _deferred_product_ids.reset(product_ids_token)
+        _deferred_order_ids.reset(order_ids_token)
+    if deferred_order_ids:
+        schedule_candidates_update(deferred_order_ids)
+    if deferred_product_ids:
+        schedule_candidates_update_for_products(deferred_product_ids)
+
+
+def _update_order_candidates(order_ids):
+    orders = (
+        Order.objects.unprocessed()
+        .filter(id__in=order_ids, restaurant__isnull=True)
+        .select_related('place')
+    )
+    restaurant_index = get_restaurant_index()
+    # продукты берутся из сводки заказа, без запроса к позициям
+    order_candidates = {
+        order.id: get_order_candidates(restaurant_index, order, load_product_ids(order.product_ids))
+        for order in orders
+    }
+    # индекс ресторанов может отставать от БД, удалённые рестораны отбрасываем
+    restaurant_ids = set(Restaurant.objects.filter(id__in={
+        restaurant_id
+        for candidates in order_candidates.values()
+        for restaurant_id, distance_km in candidates
+    }).values_list('id', flat=True))
+
+    candidates = [
+        OrderCandidate(order_id=order_id, restaurant_id=restaurant_id, distance_km=distance_km)
+        for order_id, candidates in order_candidates.items()
+        for restaurant_id, distance_km in candidates
+        if restaurant_id in restaurant_ids
+    ]
+    with transaction.atomic():
+        OrderCandidate.objects.filter(order__in=order_ids).delete()
+        OrderCandidate.objects.bulk_create(candidates)
+
+
+def get_open_order_ids():
+    return Order.objects.unprocessed().filter(restaurant__isnull=True).values_list('id', flat=True)
+
+
+def update_candidates_for_products(product_ids):
+    """
+    Пересчитывает кандидатов для заказов без ресторана, в которых есть эти продукты.
+    Заказы отбираются по сводке product_ids, без соединения с позициями.
+    """
+    product_ids = set(product_ids)
+    open_orders = (
+        Order.objects.unprocessed()
+        .filter(restaurant__isnull=True)
+        .values_list('id', 'product_ids')
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+    update_order_candidates([
+        order_id
+        for order_id, order_product_ids in open_orders
+        if product_ids & load_product_ids(order_product_ids)
+    ])
+
+
+def rebuild_order_candidates():
+    """
+    Пересчитывает кандидатов для всех заказов без ресторана, например после
+    изменения ресторанов или bulk-операций, которые не отправляют сигналы
+    """
+    OrderCandidate.objects.exclude(order__in=get_open_order_ids()).delete()
+    update_order_candidates(get_open_order_ids().iterator(chunk_size=BATCH_SIZE))
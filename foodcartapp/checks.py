@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+PROCESS_LOCAL_CACHE_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+}
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Каталог, баннеры, матрица доступности и индекс ресторанов сбрасываются сменой
+    версии в кэше. С кэшем в памяти процесса другие воркеры сброса не видят.
+    """
+    if settings.DEBUG:
+        return []
+    backend = settings.CACHES['default']['BACKEND']
+    if backend not in PROCESS_LOCAL_CACHE_BACKENDS:
+        return []
+    return [
+        Error(
+            f'Кэш {backend} у каждого воркера свой, и воркеры отдают устаревшие данные после изменений.',
+            hint='Задайте CACHE_URL с общим кэшем, например dbcache://star_burger_cache '
+                 'или pymemcache://127.0.0.1:11211.',
+            id='foodcartapp.E001',
+        ),
+    ]
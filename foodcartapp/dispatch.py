@@ -0,0 +1,117 @@
+import heapq
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+
+from .candidates import update_order_candidates
+from .loads import get_in_flight_orders
+from .models import Order, OrderCandidate
+from .signals import orders_dispatched
+
+
+def get_restaurant_loads():
+    """
+    :return: словарь {id ресторана: сколько у него необработанных заказов}. Заказы
+        в работе берутся из счётчиков, по таблице считаются только новые назначенные заказы.
+    """
+    loads = defaultdict(int, get_in_flight_orders())
+    assigned_orders = (
+        Order.objects
+        .filter(status=Order.NEW, restaurant__isnull=False)
+        .values_list('restaurant')
+        .annotate(orders_count=Count('id'))
+    )
+    for restaurant_id, orders_count in assigned_orders:
+        loads[restaurant_id] += orders_count
+    return loads
+
+
+def plan_dispatch(order_candidates, loads, capacity, load_penalty_km):
+    """
+    Жадно распределяет заказы по ресторанам: на каждом шаге выбирается самая дешёвая
+    пара заказ — ресторан, где цена — расстояние плюс штраф за каждый заказ
+    в работе у ресторана. Нагрузка растёт по мере распределения, поэтому цена пары
+    пересчитывается при извлечении из кучи, а подорожавшая пара возвращается в кучу.
+    :param order_candidates: словарь {id заказа: [(id ресторана, расстояние в км), ...]}
+    :param loads: словарь {id ресторана: заказов в работе}
+    :param capacity: больше стольких заказов ресторану не назначается
+    :return: словарь {id заказа: id ресторана}, заказы без подходящих ресторанов пропускаются
+    """
+    loads = defaultdict(int, loads)
+    heap = [
+        (distance_km + load_penalty_km * loads[restaurant_id], distance_km, order_id, restaurant_id)
+        for order_id, candidates in order_candidates.items()
+        for restaurant_id, distance_km in candidates
+        if loads[restaurant_id] < capacity
+    ]
+    heapq.heapify(heap)
+
+    assignments = {}
+    while heap:
+        cost, distance_km, order_id, restaurant_id = heapq.heappop(heap)
+        if order_id in assignments or loads[restaurant_id] >= capacity:
+            continue
+        current_cost = distance_km + load_penalty_km * loads[restaurant_id]
+        if current_cost > cost:
+            heapq.heappush(heap, (current_cost, distance_km, order_id, restaurant_id))
+            continue
+        assignments[order_id] = restaurant_id
+        loads[restaurant_id] += 1
+    return assignments
+
+
+def get_dispatch_candidates(order_ids):
+    """
+    :return: словарь {id заказа: [(id ресторана, расстояние в км), ...]} по сохранённым
+        кандидатам, заказы без координат пропускаются
+    """
+    order_candidates = defaultdict(list)
+    candidates = (
+        OrderCandidate.objects
+        .filter(order__in=order_ids, distance_km__isnull=False)
+        .values_list('order', 'restaurant', 'distance_km')
+    )
+    for order_id, restaurant_id, distance_km in candidates:
+        order_candidates[order_id].append((restaurant_id, distance_km))
+    return order_candidates
+
+
+def dispatch_orders(batch_size=None):
+    """
+    Назначает рестораны новым заказам без ресторана одним bulk_update.
+    Заказы блокируются на время расчёта; заказы, уже заблокированные
+    менеджером, пропускаются до следующего запуска.
+    :return: словарь {id заказа: id ресторана}
+    """
+    with transaction.atomic():
+        orders = (
+            Order.objects
+            .filter(status=Order.NEW, restaurant__isnull=True)
+            .order_by('registration_date', 'id')
+        )
+        if connection.features.has_select_for_update_skip_locked:
+            orders = orders.select_for_update(skip_locked=True)
+        if batch_size:
+            orders = orders[:batch_size]
+        order_ids = list(orders.values_list('id', flat=True))
+
+        assignments = plan_dispatch(
+            get_dispatch_candidates(order_ids),
+            get_restaurant_loads(),
+            capacity=settings.DISPATCH_RESTAURANT_CAPACITY,
+            load_penalty_km=settings.DISPATCH_LOAD_PENALTY_KM,
+        )
+        dispatched_orders = [
+            Order(id=order_id, restaurant_id=restaurant_id)
+            for order_id, restaurant_id in assignments.items()
+        ]
+        Order.objects.bulk_update(dispatched_orders, ['restaurant'], batch_size=1000)
+
+        # bulk_update не отправляет сигналы
+        dispatched_ids = list(assignments)
+        if dispatched_ids:
+            transaction.on_commit(lambda: update_order_candidates(dispatched_ids))
+            orders_dispatched.send(sender=Order, order_ids=dispatched_ids)
+    return assignments
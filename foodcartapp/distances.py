@@ -0,0 +1,46 @@
+import numpy as np
+from geopy import distance
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def get_distance_matrix(origins, destinations):
+    """
+    Возвращает матрицу расстояний по формуле гаверсинусов за один векторный проход
+    :param origins: координаты начальных точек [(широта, долгота), ...]
+    :param destinations: координаты конечных точек [(широта, долгота), ...]
+    :return: numpy-массив len(origins) x len(destinations) с расстояниями в км
+    """
+    origins = np.radians(np.asarray(origins, dtype=float).reshape(-1, 2))
+    destinations = np.radians(np.asarray(destinations, dtype=float).reshape(-1, 2))
+
+    origin_lat = origins[:, 0, np.newaxis]
+    origin_lon = origins[:, 1, np.newaxis]
+    destination_lat = destinations[np.newaxis, :, 0]
+    destination_lon = destinations[np.newaxis, :, 1]
+
+    haversine = (
+        np.sin((destination_lat - origin_lat) / 2) ** 2
+        + np.cos(origin_lat) * np.cos(destination_lat) * np.sin((destination_lon - origin_lon) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(haversine, 0, 1)))
+
+
+def refine_nearest(origins, destinations, distance_matrix, k):
+    """
+    Уточняет расстояния до k ближайших точек по геодезической формуле
+    :param distance_matrix: матрица из get_distance_matrix
+    :return: (индексы ближайших точек, расстояния в км), массивы len(origins) x k,
+        отсортированные по уточнённому расстоянию
+    """
+    k = min(k, distance_matrix.shape[1])
+    if not k:
+        empty = np.empty((distance_matrix.shape[0], 0))
+        return empty.astype(int), empty
+    nearest = np.argpartition(distance_matrix, k - 1, axis=1)[:, :k]
+    refined = np.array([
+        [distance.distance(origins[row], destinations[column]).km for column in columns]
+        for row, columns in enumerate(nearest)
+    ]).reshape(nearest.shape)
+    order = np.argsort(refined, axis=1)
+    return np.take_along_axis(nearest, order, axis=1), np.take_along_axis(refined, order, axis=1)
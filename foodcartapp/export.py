@@ -0,0 +1,149 @@
+import csv
+import heapq
+import json
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import ArchivedOrder, Order
+
+CHUNK_SIZE = 2000
+
+ORDER_FIELDS = [
+    'id', 'registration_date', 'status', 'pay', 'firstname', 'lastname', 'phonenumber',
+    'address', 'total_price', 'restaurant_id', 'comment', 'call_date', 'delivery_date',
+]
+ITEM_FIELDS = ['product_id', 'product__name', 'quantity', 'price']
+CSV_HEADER = ORDER_FIELDS + ['product_id', 'product_name', 'quantity', 'price']
+
+
+def get_day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def filter_by_registration_date(orders, date_from=None, date_to=None):
+    """
+    Отбирает заказы, зарегистрированные с date_from по date_to включительно.
+    Сравнение с границами суток, а не __date, чтобы работал индекс по registration_date.
+    """
+    if date_from:
+        orders = orders.filter(registration_date__gte=get_day_start(date_from))
+    if date_to:
+        orders = orders.filter(registration_date__lt=get_day_start(date_to + timedelta(days=1)))
+    return orders
+
+
+def iter_orders_with_items(orders, chunk_size=CHUNK_SIZE):
+    """
+    Обходит заказы курсором на стороне БД и догружает позиции одним запросом
+    на каждую пачку заказов, поэтому в памяти не больше chunk_size заказов
+    :param orders: заказы или архивные заказы
+    :return: генератор словарей заказов с ключом 'items'
+    """
+    item_model = orders.model._meta.get_field('items').related_model
+    orders = orders.order_by('registration_date', 'id').values(*ORDER_FIELDS).iterator(chunk_size=chunk_size)
+    chunk = []
+    for order in orders:
+        chunk.append(order)
+        if len(chunk) >= chunk_size:
+            yield from attach_items(chunk, item_model)
+            chunk = []
+    if chunk:
+        yield from attach_items(chunk, item_model)
+
+
+def attach_items(orders, item_model):
+    items = defaultdict(list)
+    order_items = (
+        item_model.objects
+        .filter(order_id__in=[order['id'] for order in orders])
+        .order_by('id')
+        .values_list('order_id', *ITEM_FIELDS)
+    )
+    for order_id, *item in order_items:
+        items[order_id].append(dict(zip(ITEM_FIELDS, item)))
+    for order in orders:
+        order['phonenumber'] = str(order['phonenumber'])
+        order['items'] = items[order['id']]
+        yield order
+
+
+class Echo:
+    """
+    Файлоподобный объект для csv.writer, который возвращает строку вместо записи
+    """
+
+    def write(self, value):
+        return value
+
+
+def iter_sources_with_items(querysets, chunk_size):
+    """
+    Сливает заказы из нескольких querysets в общий порядок по дате регистрации и id
+    """
+    return heapq.merge(
+        *(iter_orders_with_items(orders, chunk_size) for orders in querysets),
+        key=lambda order: (order['registration_date'], order['id']),
+    )
+
+
+def iter_orders_csv(querysets, chunk_size=CHUNK_SIZE):
+    """
+    Строки CSV: по строке на позицию заказа, заказы без позиций — одной строкой
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for order in iter_sources_with_items(querysets, chunk_size):
+        order_row = [order[field] for field in ORDER_FIELDS]
+        for item in order['items'] or [dict.fromkeys(ITEM_FIELDS, '')]:
+            yield writer.writerow(order_row + [item[field] for field in ITEM_FIELDS])
+
+
+def iter_orders_jsonl(querysets, chunk_size=CHUNK_SIZE):
+    """
+    Строки JSON Lines: по заказу с позициями на строку
+    """
+    for order in iter_sources_with_items(querysets, chunk_size):
+        for item in order['items']:
+            item['product_name'] = item.pop('product__name')
+        yield json.dumps(order, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+EXPORT_FORMATS = {
+    'csv': (iter_orders_csv, 'text/csv; charset=utf-8'),
+    'jsonl': (iter_orders_jsonl, 'application/x-ndjson; charset=utf-8'),
+}
+
+
+ORDER_SOURCES = {
+    'current': 'Текущие',
+    'archived': 'Архивные',
+    'all': 'Все',
+}
+
+
+def get_source_querysets(source):
+    """
+    :return: список querysets заказов для выгрузки
+    """
+    querysets = []
+    if source in ('archived', 'all'):
+        querysets.append(ArchivedOrder.objects.all())
+    if source in ('current', 'all'):
+        querysets.append(Order.objects.all())
+    return querysets
+
+
+def export_orders(export_format, date_from=None, date_to=None, source='current', chunk_size=CHUNK_SIZE):
+    """
+    :param source: ключ ORDER_SOURCES — текущие заказы, архивные или все
+    :return: генератор строк в формате export_format
+    """
+    write_rows, content_type = EXPORT_FORMATS[export_format]
+    querysets = [
+        filter_by_registration_date(orders, date_from, date_to)
+        for orders in get_source_querysets(source)
+    ]
+    return write_rows(querysets, chunk_size)
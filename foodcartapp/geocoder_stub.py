@@ -0,0 +1,80 @@
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def get_stub_coordinates(address):
+    """
+    Детерминированные координаты адреса в окрестностях Москвы
+    :return: (долгота, широта), как в ответе геокодера
+    """
+    digest = hashlib.md5(address.encode()).digest()
+    lon = 37.3 + digest[0] / 255 * 0.6
+    lat = 55.5 + digest[1] / 255 * 0.4
+    return lon, lat
+
+
+class GeocoderStubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        server.requests_count += 1
+        query = parse_qs(urlparse(self.path).query)
+        address = query.get('geocode', [''])[0]
+
+        if address in server.failing_addresses:
+            self.send_response(500)
+            self.end_headers()
+            return
+
+        found_places = []
+        if address and address not in server.unknown_addresses:
+            lon, lat = get_stub_coordinates(address)
+            found_places.append({'GeoObject': {'Point': {'pos': f'{lon} {lat}'}}})
+
+        body = json.dumps({
+            'response': {'GeoObjectCollection': {'featureMember': found_places}},
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class GeocoderStub:
+    """
+    Локальная заглушка HTTP API Яндекс геокодера для тестов и бенчмарков.
+
+        with GeocoderStub() as stub, override_settings(GEOCODER_URL=stub.url):
+            ...
+    """
+
+    def __init__(self, unknown_addresses=(), failing_addresses=()):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), GeocoderStubHandler)
+        self.server.daemon_threads = True
+        self.server.requests_count = 0
+        self.server.unknown_addresses = set(unknown_addresses)
+        self.server.failing_addresses = set(failing_addresses)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f'http://{host}:{port}/1.x'
+
+    @property
+    def requests_count(self):
+        return self.server.requests_count
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from foodcartapp.get_geo import get_geocoder_client
+from foodcartapp.models import Place
+
+
+class TTLCache:
+    """
+    LRU-кэш в памяти процесса, записи в котором устаревают через ttl секунд
+    """
+    missing = object()
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key, self.missing)
+            if item is self.missing:
+                return self.missing
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._items[key]
+                return self.missing
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+places_cache = TTLCache(
+    maxsize=settings.GEOCODER_CACHE_SIZE,
+    ttl=settings.GEOCODER_CACHE_TTL,
+)
+
+
+def find_places(addresses):
+    """
+    Ищет уже известные места без обращения к геокодеру
+    :return: словарь {адрес: Place}
+    """
+    return Place.objects.in_bulk(set(addresses), field_name='name')
+
+
+def geocode_places(api_key, addresses):
+    """
+    Геокодирует адреса параллельно и возвращает несохранённые объекты Place.
+    Адреса, которые геокодер не нашёл, получают пустые координаты,
+    адреса с сетевыми ошибками пропускаются.
+    """
+    new_places = []
+    for address, found_coordinates in get_geocoder_client(api_key).fetch_many(addresses).items():
+        lon, lat = map(float, found_coordinates) if found_coordinates else (None, None)
+        new_places.append(Place(name=address, lon=lon, lat=lat))
+    return new_places
+
+
+def get_places(api_key, addresses):
+    """
+    Возвращает сохранённые места для набора адресов, геокодируя недостающие
+    :return: словарь {адрес: Place}, адреса с сетевыми ошибками пропускаются
+    """
+    places = find_places(addresses)
+    new_places = geocode_places(api_key, set(addresses) - places.keys())
+    if new_places:
+        Place.objects.bulk_create(new_places, ignore_conflicts=True)
+        places.update(find_places(place.name for place in new_places))
+    for place in places.values():
+        places_cache.set(place.name, place.coordinates)
+    return places
+
+
+def get_places_coordinates(api_key, addresses):
+    """
+    Возвращает координаты сразу для набора адресов.
+
+    Адреса ищутся сначала в кэше процесса, затем одним запросом в таблице Place,
+    оставшиеся геокодируются и сохраняются одним bulk_create. Адреса, которые
+    геокодер не нашёл, тоже сохраняются, чтобы не запрашивать их повторно.
+    :param api_key: ключ для yandex api
+    :param addresses: адреса
+    :return: словарь {адрес: (широта, долгота) или None, если адрес не найден}
+    """
+    coordinates = {}
+    missed_addresses = set()
+    for address in set(addresses):
+        cached_coordinates = places_cache.get(address)
+        if cached_coordinates is TTLCache.missing:
+            missed_addresses.add(address)
+            coordinates[address] = None
+        else:
+            coordinates[address] = cached_coordinates
+
+    if missed_addresses:
+        for address, place in get_places(api_key, missed_addresses).items():
+            coordinates[address] = place.coordinates
+    return coordinates
+
+
+def enqueue_geocoding(objects):
+    """
+    Связывает заказы или рестораны с уже известными местами одним запросом.
+    Объекты с неизвестными адресами получают place=None и остаются в очереди
+    команды geocode_addresses, сеть при этом не используется.
+    """
+    places = find_places(obj.address for obj in objects if obj.address)
+    for obj in objects:
+        obj.place = places.get(obj.address)
+
+
+def geocode_pending(api_key, queryset, batch_size=100):
+    """
+    Один проход по очереди геокодирования: объекты из queryset без места
+    обрабатываются пачками, места сохраняются одним bulk_update на пачку
+    :return: (сколько объектов было в очереди, id объектов, связанных с местом)
+    """
+    pending = queryset.filter(place__isnull=True).exclude(address='').order_by('id')
+    queued_count = 0
+    linked_ids = []
+    last_id = 0
+    while True:
+        batch = list(pending.filter(id__gt=last_id).only('id', 'address')[:batch_size])
+        if not batch:
+            break
+        last_id = batch[-1].id
+        places = get_places(api_key, {obj.address for obj in batch})
+        linked = []
+        for obj in batch:
+            obj.place = places.get(obj.address)
+            if obj.place:
+                linked.append(obj)
+        queryset.model.objects.bulk_update(linked, ['place'])
+        queued_count += len(batch)
+        linked_ids.extend(obj.id for obj in linked)
+    return queued_count, linked_ids
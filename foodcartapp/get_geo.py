@@ -1,19 +1,146 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from .metrics import record_outbound_time
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Ограничивает частоту запросов: не больше rate запросов в секунду
+    с возможным всплеском до capacity запросов
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class GeocoderClient:
+    """
+    Клиент Яндекс геокодера: переиспользует соединения из пула, ограничивает
+    частоту запросов, повторяет запросы при сетевых ошибках и ответах 429/5xx
+    с экспоненциальной задержкой и умеет геокодировать адреса параллельно.
+    """
+
+    def __init__(self, apikey, base_url, timeout=5, max_workers=8, rate_limit=10, retries=3, backoff=0.5):
+        self.apikey = apikey
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.rate_limiter = TokenBucket(rate_limit)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, address):
+        for attempt in range(self.retries + 1):
+            self.rate_limiter.acquire()
+            started_at = time.perf_counter()
+            try:
+                response = self.session.get(self.base_url, timeout=self.timeout, params={
+                    "geocode": address,
+                    "apikey": self.apikey,
+                    "format": "json",
+                })
+                if response.status_code not in RETRY_STATUS_CODES or attempt == self.retries:
+                    response.raise_for_status()
+                    return response
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+            finally:
+                record_outbound_time(time.perf_counter() - started_at)
+            time.sleep(self.backoff * 2 ** attempt)
+
+    def fetch_coordinates(self, address):
+        response = self.request(address)
+        found_places = response.json()['response']['GeoObjectCollection']['featureMember']
+
+        if not found_places:
+            return None
+
+        most_relevant = found_places[0]
+        lon, lat = most_relevant['GeoObject']['Point']['pos'].split(" ")
+        return lat, lon
+
+    def fetch_many(self, addresses):
+        """
+        Геокодирует адреса параллельно, не больше max_workers запросов одновременно
+        :return: словарь {адрес: (широта, долгота) или None}, адреса с ошибками пропускаются
+        """
+        addresses = list(addresses)
+        if not addresses:
+            return {}
+
+        def fetch(address):
+            try:
+                return address, self.fetch_coordinates(address), None
+            except requests.RequestException as error:
+                return address, None, error
+
+        def fetch_in_context(context, address):
+            return context.run(fetch, address)
+
+        # потоки пула не наследуют contextvars, а по ним время запросов попадает в метрики
+        contexts = [contextvars.copy_context() for _ in addresses]
+        coordinates = {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(addresses))) as executor:
+            for address, found_coordinates, error in executor.map(fetch_in_context, contexts, addresses):
+                if error is None:
+                    coordinates[address] = found_coordinates
+        return coordinates
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_geocoder_client(apikey):
+    """
+    Общий для процесса клиент, чтобы соединения и ограничение частоты запросов
+    действовали на все вызовы сразу
+    """
+    key = (apikey, settings.GEOCODER_URL)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = GeocoderClient(
+                apikey,
+                settings.GEOCODER_URL,
+                timeout=settings.GEOCODER_TIMEOUT,
+                max_workers=settings.GEOCODER_MAX_WORKERS,
+                rate_limit=settings.GEOCODER_RATE_LIMIT,
+                retries=settings.GEOCODER_RETRIES,
+                backoff=settings.GEOCODER_BACKOFF,
+            )
+        return _clients[key]
 
 
 def fetch_coordinates(apikey, address):
-    base_url = "https://geocode-maps.yandex.ru/1.x"
-    response = requests.get(base_url, params={
-        "geocode": address,
-        "apikey": apikey,
-        "format": "json",
-    })
-    response.raise_for_status()
-    found_places = response.json()['response']['GeoObjectCollection']['featureMember']
-
-    if not found_places:
-        return None
-
-    most_relevant = found_places[0]
-    lon, lat = most_relevant['GeoObject']['Point']['pos'].split(" ")
-    return lat, lon
+    return get_geocoder_client(apikey).fetch_coordinates(address)
@@ -0,0 +1,89 @@
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import Order, Restaurant, RestaurantLoad
+
+
+def is_in_flight(restaurant_id, status):
+    return restaurant_id is not None and status in Order.IN_FLIGHT_STATUSES
+
+
+def change_in_flight_orders(restaurant_id, delta):
+    """
+    Атомарно меняет счётчик заказов в работе одним UPDATE с F().
+    Строка счётчика создаётся при первом заказе ресторана.
+    """
+    updated = RestaurantLoad.objects.filter(restaurant_id=restaurant_id).update(
+        in_flight_orders=F('in_flight_orders') + delta,
+    )
+    if updated or delta < 0:
+        return
+    load, created = RestaurantLoad.objects.get_or_create(
+        restaurant_id=restaurant_id,
+        defaults={'in_flight_orders': delta},
+    )
+    if not created:
+        change_in_flight_orders(restaurant_id, delta)
+
+
+def get_restaurant_in_flight_orders(restaurant):
+    """
+    :param restaurant: ресторан, загруженный с select_related('load')
+    """
+    try:
+        return restaurant.load.in_flight_orders
+    except RestaurantLoad.DoesNotExist:
+        return 0
+
+
+def get_in_flight_orders():
+    """
+    :return: словарь {id ресторана: заказов в работе} по счётчикам, без обращения к таблице заказов
+    """
+    return dict(RestaurantLoad.objects.values_list('restaurant_id', 'in_flight_orders'))
+
+
+def count_in_flight_orders():
+    """
+    :return: словарь {id ресторана: заказов в работе}, посчитанный по таблице заказов
+    """
+    return dict(
+        Order.objects
+        .filter(status__in=Order.IN_FLIGHT_STATUSES, restaurant__isnull=False)
+        .values_list('restaurant')
+        .annotate(orders_count=Count('id'))
+    )
+
+
+def reconcile_restaurant_loads(dry_run=False):
+    """
+    Пересчитывает счётчики по таблице заказов и исправляет расхождения.
+    Строки счётчиков блокируются до подсчёта, поэтому заказы, сохранённые
+    параллельно, дождутся окончания и изменят уже исправленный счётчик.
+    :return: словарь {id ресторана: (значение счётчика, настоящее значение)} для расходящихся
+    """
+    with transaction.atomic():
+        loads = {
+            load.restaurant_id: load
+            for load in RestaurantLoad.objects.select_for_update()
+        }
+        actual = count_in_flight_orders()
+        drift = {}
+        changed_loads = []
+        new_loads = []
+        for restaurant_id in Restaurant.objects.values_list('id', flat=True):
+            orders_count = actual.get(restaurant_id, 0)
+            load = loads.get(restaurant_id)
+            if load is None:
+                new_loads.append(RestaurantLoad(restaurant_id=restaurant_id, in_flight_orders=orders_count))
+                if orders_count:
+                    drift[restaurant_id] = (None, orders_count)
+            elif load.in_flight_orders != orders_count:
+                drift[restaurant_id] = (load.in_flight_orders, orders_count)
+                load.in_flight_orders = orders_count
+                changed_loads.append(load)
+
+        if not dry_run:
+            RestaurantLoad.objects.bulk_create(new_loads, ignore_conflicts=True)
+            RestaurantLoad.objects.bulk_update(changed_loads, ['in_flight_orders'], batch_size=1000)
+    return drift
@@ -0,0 +1,57 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def get_percentile(values, percent):
+    if not values:
+        return 0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(percent / 100 * len(values)) - 1))
+    return values[index]
+
+
+def summarize_latencies(latencies, elapsed):
+    """
+    :param latencies: длительности запросов в секундах
+    :param elapsed: общее время прогона в секундах
+    :return: словарь с перцентилями в миллисекундах и пропускной способностью
+    """
+    return {
+        'requests': len(latencies),
+        'p50_ms': round(get_percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(get_percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(get_percentile(latencies, 99) * 1000, 2),
+        'max_ms': round(max(latencies, default=0) * 1000, 2),
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else 0,
+    }
+
+
+def run_http_load(url, requests_count, concurrency, method='GET', json_body=None, headers=None):
+    """
+    Отправляет requests_count запросов на url, не больше concurrency одновременно
+    :return: сводка summarize_latencies и число ошибок
+    """
+    sessions = threading.local()
+
+    def send(_):
+        if not hasattr(sessions, 'session'):
+            sessions.session = requests.Session()
+        started_at = time.perf_counter()
+        try:
+            response = sessions.session.request(method, url, json=json_body, headers=headers, timeout=30)
+            failed = response.status_code >= 400
+        except requests.RequestException:
+            failed = True
+        return time.perf_counter() - started_at, failed
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(send, range(requests_count)))
+    elapsed = time.perf_counter() - started_at
+
+    summary = summarize_latencies([latency for latency, failed in results], elapsed)
+    summary['errors'] = sum(failed for latency, failed in results)
+    return summary
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from foodcartapp.archive import BATCH_SIZE, archive_orders
+
+
+class Command(BaseCommand):
+    help = 'Переносит старые доставленные заказы в архивные таблицы пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.ORDERS_ARCHIVE_AFTER_DAYS,
+            help='переносить заказы, зарегистрированные больше стольких дней назад',
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='заказов в одной транзакции')
+        parser.add_argument('--dry-run', action='store_true', help='только посчитать заказы для переноса')
+
+    def handle(self, *args, **options):
+        archived_count = archive_orders(options['days'], options['batch_size'], options['dry_run'])
+        action = 'будет перенесено' if options['dry_run'] else 'перенесено'
+        self.stdout.write(f'{action} заказов: {archived_count}')
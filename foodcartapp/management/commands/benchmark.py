@@ -0,0 +1,116 @@
+import json
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+
+from foodcartapp.benchmark import get_order_address, measure_requests, seed_database
+from foodcartapp.geocoder_stub import GeocoderStub
+from foodcartapp.models import Product
+
+ENDPOINTS = {
+    'products': ('GET', '/api/products/'),
+    'order': ('POST', '/api/order/'),
+    'manager_orders': ('GET', '/manager/orders/'),
+    'manager_products': ('GET', '/manager/products/'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт временную БД, заполняет её тестовыми данными и измеряет задержки, '
+        'пропускную способность и число SQL-запросов витрины и страниц менеджера. '
+        'Геокодер заменяется локальной заглушкой, результат выводится в JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--restaurants', type=int, default=20)
+        parser.add_argument('--products', type=int, default=50)
+        parser.add_argument('--menu-size', type=int, default=30, help='продуктов в меню каждого ресторана')
+        parser.add_argument('--orders', type=int, default=1000)
+        parser.add_argument('--addresses', type=int, default=300, help='разных адресов доставки')
+        parser.add_argument('--requests', type=int, default=200, help='запросов к каждому эндпоинту')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--endpoint',
+            action='append',
+            choices=list(ENDPOINTS),
+            help='какие эндпоинты измерять, по умолчанию все',
+        )
+        parser.add_argument('--output', help='записать JSON в файл, а не в stdout')
+
+    def handle(self, *args, **options):
+        old_database_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with GeocoderStub() as geocoder, override_settings(
+                GEOCODER_URL=geocoder.url,
+                # заглушка локальная, ограничение частоты запросов к Яндексу только замедлит заполнение
+                GEOCODER_RATE_LIMIT=10000,
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                CACHES={'default': {
+                    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                    'LOCATION': 'benchmark',
+                }},
+            ):
+                results = self.run_benchmark(options)
+                results['seed']['geocoder_requests'] = geocoder.requests_count
+        finally:
+            connection.creation.destroy_test_db(old_database_name, verbosity=0)
+
+        report = json.dumps(results, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(report)
+        else:
+            self.stdout.write(report)
+
+    def run_benchmark(self, options):
+        started_at = time.perf_counter()
+        seed_stats = seed_database(
+            options['restaurants'],
+            options['products'],
+            options['menu_size'],
+            options['orders'],
+            options['addresses'],
+            seed=options['seed'],
+        )
+        seed_stats['seconds'] = round(time.perf_counter() - started_at, 2)
+
+        manager = get_user_model().objects.create_user('benchmark', is_staff=True)
+        client = Client()
+        client.force_login(manager)
+        rng = random.Random(options['seed'])
+        product_ids = list(Product.objects.available().values_list('id', flat=True))
+
+        def get_order_data():
+            return {
+                'products': [
+                    {'product': product_id, 'quantity': rng.randint(1, 3)}
+                    for product_id in rng.sample(product_ids, min(rng.randint(1, 5), len(product_ids)))
+                ],
+                'firstname': 'Иван',
+                'lastname': 'Покупатель',
+                'phonenumber': '+79001234567',
+                'address': get_order_address(rng.randrange(options['addresses'])),
+            }
+
+        endpoints = {}
+        for endpoint in options['endpoint'] or ENDPOINTS:
+            method, path = ENDPOINTS[endpoint]
+            endpoints[endpoint] = measure_requests(
+                client,
+                method,
+                path,
+                options['requests'],
+                get_data=get_order_data if method == 'POST' else None,
+            )
+        return {
+            'database': connection.vendor,
+            'seed': seed_stats,
+            'endpoints': endpoints,
+        }
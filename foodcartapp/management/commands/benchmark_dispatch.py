@@ -0,0 +1,61 @@
+import random
+import time
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from foodcartapp.dispatch import plan_dispatch
+from foodcartapp.distances import get_distance_matrix
+from foodcartapp.management.commands.benchmark_distances import get_random_coordinates
+
+
+class Command(BaseCommand):
+    help = 'Измеряет время распределения случайных заказов по ресторанам и качество распределения'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=5000)
+        parser.add_argument('--restaurants', type=int, default=300)
+        parser.add_argument(
+            '--candidates',
+            type=int,
+            default=settings.NEAREST_RESTAURANTS_COUNT,
+            help='ближайших ресторанов на заказ, 0 — все рестораны',
+        )
+        parser.add_argument('--capacity', type=int, default=settings.DISPATCH_RESTAURANT_CAPACITY)
+        parser.add_argument('--load-penalty', type=float, default=settings.DISPATCH_LOAD_PENALTY_KM)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        orders = get_random_coordinates(options['orders'])
+        restaurants = get_random_coordinates(options['restaurants'])
+        candidates_count = options['candidates'] or len(restaurants)
+        candidates_count = min(candidates_count, len(restaurants))
+
+        started_at = time.perf_counter()
+        matrix = get_distance_matrix(orders, restaurants)
+        nearest = np.argpartition(matrix, candidates_count - 1, axis=1)[:, :candidates_count]
+        order_candidates = {
+            order_id: [(int(restaurant_id), float(matrix[order_id, restaurant_id])) for restaurant_id in row]
+            for order_id, row in enumerate(nearest)
+        }
+        candidates_time = time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        assignments = plan_dispatch(order_candidates, {}, options['capacity'], options['load_penalty'])
+        dispatch_time = time.perf_counter() - started_at
+
+        loads = Counter(assignments.values())
+        distances = [matrix[order_id, restaurant_id] for order_id, restaurant_id in assignments.items()]
+        self.stdout.write(f'заказов: {len(orders)}, ресторанов: {len(restaurants)}, кандидатов: {candidates_count}')
+        self.stdout.write(f'матрица и кандидаты: {candidates_time:.3f} с')
+        self.stdout.write(f'распределение: {dispatch_time:.3f} с')
+        self.stdout.write(f'назначено: {len(assignments)}, без ресторана: {len(orders) - len(assignments)}')
+        if assignments:
+            self.stdout.write(
+                f'среднее расстояние: {np.mean(distances):.2f} км '
+                f'(до ближайшего ресторана: {matrix.min(axis=1).mean():.2f} км)'
+            )
+            self.stdout.write(f'наибольшая загрузка ресторана: {max(loads.values())}')
@@ -0,0 +1,45 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from geopy import distance
+
+from foodcartapp.distances import get_distance_matrix
+
+
+def get_random_coordinates(count):
+    return [(random.uniform(55.5, 55.9), random.uniform(37.3, 37.9)) for _ in range(count)]
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает расчёт матрицы расстояний numpy с попарным расчётом geopy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=200)
+        parser.add_argument('--restaurants', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        orders = get_random_coordinates(options['orders'])
+        restaurants = get_random_coordinates(options['restaurants'])
+        pairs_count = len(orders) * len(restaurants)
+
+        started_at = time.perf_counter()
+        geodesic_matrix = [
+            [distance.distance(order, restaurant).km for restaurant in restaurants]
+            for order in orders
+        ]
+        geodesic_time = time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        haversine_matrix = get_distance_matrix(orders, restaurants)
+        haversine_time = time.perf_counter() - started_at
+
+        max_error = abs(haversine_matrix - geodesic_matrix).max() if pairs_count else 0
+        self.stdout.write(f'пар: {pairs_count}')
+        self.stdout.write(f'geopy попарно: {geodesic_time:.4f} с')
+        self.stdout.write(f'numpy матрица: {haversine_time:.4f} с')
+        if haversine_time:
+            self.stdout.write(f'ускорение: {geodesic_time / haversine_time:.0f}x')
+        self.stdout.write(f'макс. расхождение: {max_error:.3f} км')
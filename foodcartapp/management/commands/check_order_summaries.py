@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.summaries import BATCH_SIZE, check_order_summaries
+
+
+class Command(BaseCommand):
+    help = 'Сверяет сводку заказов (число позиций и набор продуктов) с позициями заказов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='исправить найденные расхождения')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='заказов в одной пачке')
+
+    def handle(self, *args, **options):
+        drift = check_order_summaries(fix=options['fix'], batch_size=options['batch_size'])
+        for order_id, (saved, actual) in sorted(drift.items()):
+            self.stdout.write(f'заказ {order_id}: в заказе {saved}, на самом деле {actual}')
+        action = 'исправлено' if options['fix'] else 'найдено'
+        self.stdout.write(f'{action} расхождений: {len(drift)}')
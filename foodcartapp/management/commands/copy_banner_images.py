@@ -0,0 +1,28 @@
+from django.contrib.staticfiles import finders
+from django.core.files import File
+from django.core.management.base import BaseCommand
+
+from foodcartapp.models import Banner
+
+
+class Command(BaseCommand):
+    help = 'Копирует картинки баннеров из статики в MEDIA_ROOT, если их там ещё нет'
+
+    def handle(self, *args, **options):
+        storage = Banner._meta.get_field('image').storage
+        copied_count = 0
+        for banner in Banner.objects.exclude(image=''):
+            name = banner.image.name
+            if storage.exists(name):
+                continue
+            image_path = finders.find(name)
+            if not image_path:
+                self.stderr.write(f'баннер «{banner}»: картинка {name} не найдена ни в MEDIA_ROOT, ни в статике')
+                continue
+            with open(image_path, 'rb') as image:
+                saved_name = storage.save(name, File(image))
+            if saved_name != name:
+                banner.image.name = saved_name
+                banner.save(update_fields=['image'])
+            copied_count += 1
+        self.stdout.write(f'скопировано картинок: {copied_count}')
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from foodcartapp.dispatch import dispatch_orders
+
+
+class Command(BaseCommand):
+    help = 'Назначает рестораны новым заказам с учётом расстояния и загрузки ресторанов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='не больше стольких заказов за проход')
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='работать постоянно, распределяя заказы каждые --interval секунд',
+        )
+        parser.add_argument('--interval', type=float, default=30)
+
+    def handle(self, *args, **options):
+        while True:
+            assignments = dispatch_orders(options['batch_size'])
+            if assignments:
+                self.stdout.write(f'назначено заказов: {len(assignments)}')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,37 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from foodcartapp.export import CHUNK_SIZE, EXPORT_FORMATS, ORDER_SOURCES, export_orders
+
+
+class Command(BaseCommand):
+    help = 'Выгружает заказы с позициями в CSV или JSON Lines, не загружая их в память целиком'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--date-from', type=date.fromisoformat, help='дата регистрации с, ГГГГ-ММ-ДД')
+        parser.add_argument('--date-to', type=date.fromisoformat, help='дата регистрации по, ГГГГ-ММ-ДД')
+        parser.add_argument(
+            '--source',
+            choices=list(ORDER_SOURCES),
+            default='current',
+            help='текущие заказы, архивные или все',
+        )
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--output', help='файл для выгрузки, по умолчанию stdout')
+
+    def handle(self, *args, **options):
+        rows = export_orders(
+            options['format'],
+            options['date_from'],
+            options['date_to'],
+            options['source'],
+            chunk_size=options['chunk_size'],
+        )
+        if not options['output']:
+            for row in rows:
+                self.stdout.write(row, ending='')
+            return
+        with open(options['output'], 'w', newline='', encoding='utf-8') as file:
+            file.writelines(rows)
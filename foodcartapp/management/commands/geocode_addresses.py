@@ -0,0 +1,45 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from foodcartapp.candidates import rebuild_order_candidates, update_order_candidates
+from foodcartapp.geocoding import geocode_pending
+from foodcartapp.models import Order, Restaurant
+from foodcartapp.spatial import invalidate_restaurant_index
+
+
+class Command(BaseCommand):
+    help = 'Геокодирует адреса заказов и ресторанов, ожидающие в очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='работать постоянно, проверяя очередь каждые --interval секунд',
+        )
+        parser.add_argument('--interval', type=float, default=5)
+
+    def handle(self, *args, **options):
+        while True:
+            self.drain(options['batch_size'])
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def drain(self, batch_size):
+        # bulk_update не отправляет сигналы, индекс ресторанов и кандидатов обновляем явно
+        order_ids = self.geocode('заказы', Order.objects.exclude(status=Order.READY), batch_size)
+        restaurant_ids = self.geocode('рестораны', Restaurant.objects.all(), batch_size)
+        if restaurant_ids:
+            invalidate_restaurant_index()
+            rebuild_order_candidates()
+        elif order_ids:
+            update_order_candidates(order_ids)
+
+    def geocode(self, title, queryset, batch_size):
+        queued_count, linked_ids = geocode_pending(settings.YANDEX_KEY, queryset, batch_size)
+        if queued_count:
+            self.stdout.write(f'{title}: в очереди {queued_count}, геокодировано {len(linked_ids)}')
+        return linked_ids
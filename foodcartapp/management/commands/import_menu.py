@@ -0,0 +1,31 @@
+import json
+import os
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from foodcartapp.menu_import import BATCH_SIZE, IMPORT_FORMATS, import_menu_availability, parse_menu_rows
+
+
+class Command(BaseCommand):
+    help = 'Обновляет доступность продуктов в ресторанах из CSV или JSON-файла'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV с колонками restaurant, product, availability или JSON-список')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help='по умолчанию по расширению файла')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='только показать, что изменится')
+
+    def handle(self, *args, **options):
+        import_format = options['format'] or os.path.splitext(options['path'])[1].lstrip('.').lower()
+        if import_format not in IMPORT_FORMATS:
+            raise CommandError('Не удалось определить формат файла, укажите --format')
+
+        with open(options['path'], encoding='utf-8-sig', newline='') as file:
+            try:
+                availability = parse_menu_rows(file, import_format)
+            except ValidationError as error:
+                raise CommandError(error.message)
+
+        stats = import_menu_availability(availability, options['batch_size'], dry_run=options['dry_run'])
+        self.stdout.write(json.dumps(stats, ensure_ascii=False))
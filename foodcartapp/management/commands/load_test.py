@@ -0,0 +1,50 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from foodcartapp.loadtest import run_http_load
+from foodcartapp.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Нагружает запущенный сервер запросами к API и выводит задержки и пропускную способность'
+
+    def add_arguments(self, parser):
+        parser.add_argument('base_url', help='адрес запущенного сервера, например http://127.0.0.1:8000')
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument(
+            '--endpoint',
+            action='append',
+            choices=['products', 'banners', 'order'],
+            help='какие эндпоинты нагружать, по умолчанию все',
+        )
+
+    def handle(self, *args, **options):
+        endpoints = options['endpoint'] or ['products', 'banners', 'order']
+        base_url = options['base_url'].rstrip('/')
+        results = {}
+        for endpoint in endpoints:
+            method, json_body = 'GET', None
+            if endpoint == 'order':
+                method, json_body = 'POST', self.get_order_body()
+            results[endpoint] = run_http_load(
+                f'{base_url}/api/{endpoint}/',
+                options['requests'],
+                options['concurrency'],
+                method=method,
+                json_body=json_body,
+            )
+        self.stdout.write(json.dumps(results, indent=2, ensure_ascii=False))
+
+    def get_order_body(self):
+        product = Product.objects.available().first()
+        if not product:
+            raise CommandError('Для нагрузки на /api/order/ нужен хотя бы один продукт в продаже')
+        return {
+            'products': [{'product': product.id, 'quantity': 1}],
+            'firstname': 'Нагрузка',
+            'lastname': 'Тест',
+            'phonenumber': '+79001234567',
+            'address': 'Москва, Красная площадь, 1',
+        }
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.candidates import rebuild_order_candidates
+from foodcartapp.models import OrderCandidate
+from foodcartapp.spatial import invalidate_restaurant_index
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает ресторанов-кандидатов для всех заказов без ресторана'
+
+    def handle(self, *args, **options):
+        invalidate_restaurant_index()
+        rebuild_order_candidates()
+        self.stdout.write(f'кандидатов: {OrderCandidate.objects.count()}')
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.loads import reconcile_restaurant_loads
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики заказов в работе по таблице заказов и показывает расхождения'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='только показать расхождения')
+
+    def handle(self, *args, **options):
+        drift = reconcile_restaurant_loads(dry_run=options['dry_run'])
+        for restaurant_id, (counter, actual) in sorted(drift.items()):
+            self.stdout.write(f'ресторан {restaurant_id}: счётчик {counter}, на самом деле {actual}')
+        action = 'найдено' if options['dry_run'] else 'исправлено'
+        self.stdout.write(f'{action} расхождений: {len(drift)}')
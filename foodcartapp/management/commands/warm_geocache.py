@@ -0,0 +1,105 @@
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from foodcartapp.geocoding import find_places, geocode_places
+from foodcartapp.models import Order, Place, Restaurant
+
+
+class Command(BaseCommand):
+    help = 'Заполняет таблицу мест координатами адресов из заказов и ресторанов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument(
+            '--progress-file',
+            help='JSON-файл с прогрессом: после перезапуска обход продолжится с последнего обработанного адреса, '
+                 'а адреса с сетевыми ошибками будут геокодированы повторно',
+        )
+
+    def handle(self, *args, **options):
+        self.progress_file = options['progress_file']
+        self.progress = self.load_progress()
+        self.stats = {'addresses': 0, 'hits': 0, 'found': 0, 'not_found': 0, 'errors': 0}
+        started_at = time.perf_counter()
+
+        self.retry_failed(options['chunk_size'])
+        for model in (Restaurant, Order):
+            self.warm(model, options['chunk_size'])
+
+        elapsed = time.perf_counter() - started_at
+        stats = self.stats
+        geocoded_count = stats['found'] + stats['not_found']
+        self.stdout.write(f'адресов: {stats["addresses"]}, уже в кэше: {stats["hits"]}')
+        self.stdout.write(
+            f'геокодировано: {geocoded_count} (найдено {stats["found"]}, не найдено {stats["not_found"]}), '
+            f'ошибок: {stats["errors"]}'
+        )
+        if stats['addresses']:
+            self.stdout.write(f'попаданий в кэш: {stats["hits"] / stats["addresses"]:.1%}')
+        if elapsed:
+            self.stdout.write(
+                f'время: {elapsed:.1f} с, {stats["addresses"] / elapsed:.1f} адресов/с, '
+                f'{geocoded_count / elapsed:.1f} запросов к геокодеру/с'
+            )
+
+    def warm(self, model, chunk_size):
+        model_name = model._meta.model_name
+        addresses = model.objects.exclude(address='').order_by('address')
+        last_address = self.progress.get(model_name)
+        if last_address is not None:
+            addresses = addresses.filter(address__gt=last_address)
+        addresses = addresses.values_list('address', flat=True).distinct().iterator(chunk_size=chunk_size)
+
+        chunk = []
+        for address in addresses:
+            chunk.append(address)
+            if len(chunk) >= chunk_size:
+                self.warm_chunk(chunk)
+                self.save_progress(model_name, chunk[-1])
+                chunk = []
+        if chunk:
+            self.warm_chunk(chunk)
+            self.save_progress(model_name, chunk[-1])
+
+    def retry_failed(self, chunk_size):
+        """
+        Повторяет адреса, на которых прошлый запуск получил сетевые ошибки.
+        Обход идёт дальше сохранённой позиции, поэтому без повтора они бы пропали.
+        """
+        failed = sorted(self.progress.get('failed', []))
+        self.progress['failed'] = []
+        for start in range(0, len(failed), chunk_size):
+            self.warm_chunk(failed[start:start + chunk_size])
+            self.save_progress()
+
+    def warm_chunk(self, addresses):
+        known_places = find_places(addresses)
+        missed_addresses = set(addresses) - known_places.keys()
+        new_places = geocode_places(settings.YANDEX_KEY, missed_addresses)
+        Place.objects.bulk_create(new_places, ignore_conflicts=True)
+
+        self.stats['addresses'] += len(addresses)
+        self.stats['hits'] += len(known_places)
+        self.stats['found'] += sum(1 for place in new_places if place.coordinates)
+        self.stats['not_found'] += sum(1 for place in new_places if not place.coordinates)
+        failed_addresses = missed_addresses - {place.name for place in new_places}
+        self.stats['errors'] += len(failed_addresses)
+        self.progress.setdefault('failed', []).extend(sorted(failed_addresses))
+
+    def load_progress(self):
+        if not self.progress_file or not os.path.exists(self.progress_file):
+            return {}
+        with open(self.progress_file) as file:
+            return json.load(file)
+
+    def save_progress(self, model_name=None, last_address=None):
+        if not self.progress_file:
+            return
+        if model_name:
+            self.progress[model_name] = last_address
+        with open(self.progress_file, 'w') as file:
+            json.dump(self.progress, file, ensure_ascii=False)
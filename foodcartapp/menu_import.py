@@ -0,0 +1,134 @@
+import csv
+import io
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .candidates import update_candidates_for_products
+from .models import Product, Restaurant, RestaurantMenuItem
+from .payloads import product_catalog
+from .signals import menu_imported
+from .spatial import invalidate_restaurant_index
+
+BATCH_SIZE = 1000
+IMPORT_FORMATS = ['csv', 'json']
+TRUE_VALUES = {'1', 'true', 'yes', 'да', '+'}
+FALSE_VALUES = {'0', 'false', 'no', 'нет', '-', ''}
+
+
+def parse_availability(value):
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValueError(f'не понятно, в продаже ли продукт: {value!r}')
+
+
+def parse_menu_rows(file, import_format):
+    """
+    Читает доступность продуктов в ресторанах из CSV с колонками
+    restaurant, product, availability или из JSON-списка объектов с такими же ключами
+    :param file: текстовый файл
+    :return: словарь {(id ресторана, id продукта): в продаже ли}, при повторах побеждает последняя строка
+    """
+    if import_format == 'json':
+        try:
+            rows = json.load(file)
+        except ValueError as error:
+            raise ValidationError(f'Некорректный JSON: {error}')
+        if not isinstance(rows, list):
+            raise ValidationError('Ожидается JSON-список объектов')
+    else:
+        rows = csv.DictReader(file)
+
+    availability = {}
+    for line_number, row in enumerate(rows, start=1):
+        try:
+            key = int(row['restaurant']), int(row['product'])
+            availability[key] = parse_availability(row['availability'])
+        except (KeyError, TypeError, ValueError) as error:
+            raise ValidationError(f'Строка {line_number}: {error}')
+    return availability
+
+
+def read_menu_file(uploaded_file, import_format):
+    """
+    То же, что parse_menu_rows, для загруженного через форму файла
+    """
+    with io.TextIOWrapper(uploaded_file, encoding='utf-8-sig') as file:
+        return parse_menu_rows(file, import_format)
+
+
+def import_menu_availability(availability, batch_size=BATCH_SIZE, dry_run=False):
+    """
+    Сравнивает доступность с пунктами меню в БД одним запросом и применяет
+    разницу через bulk_create и bulk_update пачками. Сигналы при этом не отправляются,
+    поэтому каталог, индекс ресторанов и кандидаты заказов обновляются здесь же.
+    :param availability: словарь {(id ресторана, id продукта): в продаже ли}
+    :return: словарь с числом созданных, изменённых и не изменившихся пунктов меню
+        и списками неизвестных ресторанов и продуктов
+    """
+    restaurant_ids = {restaurant_id for restaurant_id, product_id in availability}
+    product_ids = {product_id for restaurant_id, product_id in availability}
+    known_restaurant_ids = set(Restaurant.objects.filter(id__in=restaurant_ids).values_list('id', flat=True))
+    known_product_ids = set(Product.objects.filter(id__in=product_ids).values_list('id', flat=True))
+
+    existing_items = {
+        (item.restaurant_id, item.product_id): item
+        for item in RestaurantMenuItem.objects
+        .filter(restaurant_id__in=known_restaurant_ids, product_id__in=known_product_ids)
+        .only('id', 'restaurant_id', 'product_id', 'availability')
+    }
+
+    new_items = []
+    changed_items = []
+    unchanged_count = 0
+    for (restaurant_id, product_id), available in availability.items():
+        if restaurant_id not in known_restaurant_ids or product_id not in known_product_ids:
+            continue
+        item = existing_items.get((restaurant_id, product_id))
+        if item is None:
+            new_items.append(RestaurantMenuItem(
+                restaurant_id=restaurant_id,
+                product_id=product_id,
+                availability=available,
+            ))
+        elif item.availability != available:
+            item.availability = available
+            changed_items.append(item)
+        else:
+            unchanged_count += 1
+
+    if not dry_run:
+        with transaction.atomic():
+            # пункт меню, добавленный параллельно, не сорвёт импорт благодаря unique_together
+            RestaurantMenuItem.objects.bulk_create(new_items, batch_size=batch_size, ignore_conflicts=True)
+            RestaurantMenuItem.objects.bulk_update(changed_items, ['availability'], batch_size=batch_size)
+            if new_items or changed_items:
+                applied_items = [
+                    (item.restaurant_id, item.product_id, item.availability)
+                    for item in new_items + changed_items
+                ]
+                transaction.on_commit(lambda: apply_menu_changes(applied_items))
+
+    return {
+        'created': len(new_items),
+        'updated': len(changed_items),
+        'unchanged': unchanged_count,
+        'unknown_restaurants': sorted(restaurant_ids - known_restaurant_ids),
+        'unknown_products': sorted(product_ids - known_product_ids),
+    }
+
+
+def apply_menu_changes(items):
+    """
+    :param items: список (id ресторана, id продукта, в продаже ли)
+    """
+    invalidate_restaurant_index()
+    update_candidates_for_products({product_id for restaurant_id, product_id, available in items})
+    product_catalog.invalidate()
+    menu_imported.send(sender=RestaurantMenuItem, items=items)
@@ -0,0 +1,163 @@
+import contextvars
+import hmac
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter as PrometheusCounter, Histogram,
+    generate_latest, multiprocess,
+)
+
+logger = logging.getLogger(__name__)
+
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+request_duration = Histogram(
+    'http_request_duration_seconds', 'Время обработки запроса', ['view', 'method'],
+)
+request_queries = Histogram(
+    'http_request_db_queries', 'Число SQL-запросов на запрос', ['view'], buckets=QUERY_COUNT_BUCKETS,
+)
+request_db_duration = Histogram(
+    'http_request_db_duration_seconds', 'Время SQL-запросов на запрос', ['view'],
+)
+request_outbound_duration = Histogram(
+    'http_request_outbound_duration_seconds', 'Время исходящих HTTP-запросов (геокодер) на запрос', ['view'],
+)
+responses = PrometheusCounter(
+    'http_responses', 'Ответы по представлениям и кодам', ['view', 'status'],
+)
+
+
+class RequestMetrics:
+    """
+    Счётчики одного запроса: SQL-запросы с их временем и время исходящих HTTP-запросов.
+    Исходящие запросы могут идти из потоков пула, поэтому добавление под блокировкой.
+    """
+
+    def __init__(self):
+        self.queries_count = 0
+        self.db_time = 0
+        self.outbound_time = 0
+        self.statements = Counter()
+        self.statements_time = Counter()
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        started_at = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started_at
+            self.queries_count += 1
+            self.db_time += duration
+            self.statements[sql] += 1
+            self.statements_time[sql] += duration
+
+    def add_outbound_time(self, duration):
+        with self.lock:
+            self.outbound_time += duration
+
+
+_current_metrics = contextvars.ContextVar('request_metrics', default=None)
+
+
+def record_outbound_time(duration):
+    """
+    Учитывает исходящий HTTP-запрос в метриках текущего запроса, если он есть
+    """
+    request_metrics = _current_metrics.get()
+    if request_metrics is not None:
+        request_metrics.add_outbound_time(duration)
+
+
+def get_view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else '<unresolved>'
+
+
+class MetricsMiddleware:
+    """
+    Записывает для каждого представления время ответа, число и время SQL-запросов
+    и время запросов к геокодеру. Медленные запросы и запросы с большим числом
+    SQL-запросов пишутся в лог вместе с самыми частыми SQL.
+
+    Тело StreamingHttpResponse (выгрузка заказов) перебирается уже после выхода
+    из middleware, поэтому SQL-запросы выгрузки не учитываются, а время ответа —
+    это время до первого байта.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_metrics = RequestMetrics()
+        token = _current_metrics.set(request_metrics)
+        started_at = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(request_metrics))
+                response = self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+        duration = time.perf_counter() - started_at
+
+        view = get_view_name(request)
+        request_duration.labels(view, request.method).observe(duration)
+        request_queries.labels(view).observe(request_metrics.queries_count)
+        request_db_duration.labels(view).observe(request_metrics.db_time)
+        request_outbound_duration.labels(view).observe(request_metrics.outbound_time)
+        responses.labels(view, str(response.status_code)).inc()
+
+        if (duration >= settings.METRICS_SLOW_REQUEST_SECONDS
+                or request_metrics.queries_count >= settings.METRICS_SLOW_REQUEST_QUERIES):
+            self.log_slow_request(request, view, duration, request_metrics)
+        return response
+
+    @staticmethod
+    def log_slow_request(request, view, duration, request_metrics):
+        top_statements = '\n'.join(
+            f'  {count} раз, {request_metrics.statements_time[sql] * 1000:.1f} мс: {sql}'
+            for sql, count in request_metrics.statements.most_common(settings.METRICS_TOP_STATEMENTS)
+        )
+        logger.warning(
+            'Медленный запрос %s %s (%s): %.0f мс, SQL: %d запросов за %.0f мс, геокодер: %.0f мс\n%s',
+            request.method,
+            request.path,
+            view,
+            duration * 1000,
+            request_metrics.queries_count,
+            request_metrics.db_time * 1000,
+            request_metrics.outbound_time * 1000,
+            top_statements,
+        )
+
+
+def get_registry():
+    # в gunicorn с несколькими воркерами метрики собираются из файлов всех процессов
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def metrics_view(request):
+    """
+    Метрики в текстовом формате Prometheus. Доступны только с заголовком
+    Authorization: Bearer <METRICS_TOKEN>; пока токен не задан, доступ закрыт.
+    Адрес клиента не проверяется: за nginx все запросы приходят с 127.0.0.1.
+    """
+    expected = f'Bearer {settings.METRICS_TOKEN}'
+    authorization = request.headers.get('Authorization', '')
+    if not settings.METRICS_TOKEN or not hmac.compare_digest(authorization.encode(), expected.encode()):
+        return HttpResponseForbidden()
+    return HttpResponse(generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.15 on 2026-10-17 20:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='place',
+            name='lat',
+            field=models.FloatField(blank=True, null=True, verbose_name='долгота'),
+        ),
+        migrations.AlterField(
+            model_name='place',
+            name='lon',
+            field=models.FloatField(blank=True, null=True, verbose_name='широта'),
+        ),
+    ]
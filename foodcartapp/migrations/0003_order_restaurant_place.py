@@ -0,0 +1,24 @@
+# Generated by Django 3.2.15 on 2026-10-17 20:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0002_place_nullable_coordinates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='place',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='orders', to='foodcartapp.place', verbose_name='Место доставки'),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='place',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='restaurants', to='foodcartapp.place', verbose_name='место'),
+        ),
+    ]
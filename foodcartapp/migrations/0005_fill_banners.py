@@ -0,0 +1,42 @@
+from django.db import migrations
+
+BANNERS = [
+    {
+        'title': 'Burger',
+        'image': 'burger.jpg',
+        'text': 'Tasty Burger at your door step',
+    },
+    {
+        'title': 'Spices',
+        'image': 'food.jpg',
+        'text': 'All Cuisines',
+    },
+    {
+        'title': 'New York',
+        'image': 'tasty.jpg',
+        'text': 'Food is incomplete without a tasty dessert',
+    },
+]
+
+
+def fill_banners(apps, schema_editor):
+    Banner = apps.get_model('foodcartapp', 'Banner')
+    if Banner.objects.exists():
+        return
+    # сохраняется только путь: миграция не пишет в MEDIA_ROOT,
+    # картинки копирует из статики команда copy_banner_images
+    Banner.objects.bulk_create(
+        Banner(title=fields['title'], image=fields['image'], text=fields['text'], position=position)
+        for position, fields in enumerate(BANNERS)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0004_banner'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_banners, migrations.RunPython.noop),
+    ]
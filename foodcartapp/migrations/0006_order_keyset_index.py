@@ -0,0 +1,17 @@
+# Generated by Django 3.2.15 on 2026-10-17 20:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0005_fill_banners'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'registration_date', 'id'], name='order_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 3.2.15 on 2026-10-17 21:21
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def fill_restaurant_loads(apps, schema_editor):
+    Order = apps.get_model('foodcartapp', 'Order')
+    Restaurant = apps.get_model('foodcartapp', 'Restaurant')
+    RestaurantLoad = apps.get_model('foodcartapp', 'RestaurantLoad')
+    in_flight_orders = dict(
+        Order.objects
+        .filter(status__in=['cooking', 'delivery'], restaurant__isnull=False)
+        .values_list('restaurant')
+        .annotate(orders_count=Count('id'))
+    )
+    RestaurantLoad.objects.bulk_create(
+        RestaurantLoad(restaurant_id=restaurant_id, in_flight_orders=in_flight_orders.get(restaurant_id, 0))
+        for restaurant_id in Restaurant.objects.values_list('id', flat=True)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0007_order_candidate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RestaurantLoad',
+            fields=[
+                ('restaurant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='load', serialize=False, to='foodcartapp.restaurant', verbose_name='ресторан')),
+                ('in_flight_orders', models.IntegerField(default=0, verbose_name='заказов готовится и доставляется')),
+            ],
+            options={
+                'verbose_name': 'загрузка ресторана',
+                'verbose_name_plural': 'загрузка ресторанов',
+            },
+        ),
+        migrations.RunPython(fill_restaurant_loads, migrations.RunPython.noop),
+    ]
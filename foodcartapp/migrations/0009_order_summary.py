@@ -0,0 +1,52 @@
+# Generated by Django 3.2.15 on 2026-10-17 21:24
+
+from itertools import groupby
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def fill_order_summaries(apps, schema_editor):
+    Order = apps.get_model('foodcartapp', 'Order')
+    OrderItem = apps.get_model('foodcartapp', 'OrderItem')
+    order_items = (
+        OrderItem.objects
+        .order_by('order_id', 'product_id')
+        .values_list('order_id', 'product_id')
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+    orders = []
+    for order_id, items in groupby(order_items, key=lambda item: item[0]):
+        product_ids = [product_id for order_id, product_id in items]
+        orders.append(Order(
+            id=order_id,
+            items_count=len(product_ids),
+            # как summaries.dump_product_ids
+            product_ids=','.join(str(product_id) for product_id in sorted(set(product_ids))),
+        ))
+        if len(orders) >= BATCH_SIZE:
+            Order.objects.bulk_update(orders, ['items_count', 'product_ids'])
+            orders = []
+    Order.objects.bulk_update(orders, ['items_count', 'product_ids'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0008_restaurant_load'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='items_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Позиций в заказе'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='product_ids',
+            field=models.TextField(blank=True, default='', help_text='id продуктов через запятую по возрастанию', verbose_name='Продукты заказа'),
+        ),
+        migrations.RunPython(fill_order_summaries, migrations.RunPython.noop),
+    ]
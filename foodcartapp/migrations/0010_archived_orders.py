@@ -0,0 +1,55 @@
+# Generated by Django 3.2.15 on 2026-10-17 21:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+import phonenumber_field.modelfields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0009_order_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False, verbose_name='id заказа')),
+                ('pay', models.CharField(choices=[('CASH', 'Наличными'), ('ELECTRON', 'Электронно')], max_length=20, verbose_name='Способ оплаты')),
+                ('status', models.CharField(choices=[('new', 'Необработанный'), ('cooking', 'Готовится'), ('delivery', 'Доставка'), ('ready', 'Доставлен')], max_length=20, verbose_name='Статус заказа')),
+                ('firstname', models.CharField(max_length=90, verbose_name='Имя')),
+                ('lastname', models.CharField(db_index=True, max_length=100, verbose_name='Фамилия')),
+                ('phonenumber', phonenumber_field.modelfields.PhoneNumberField(db_index=True, max_length=128, region=None, verbose_name='Телефон')),
+                ('address', models.CharField(max_length=100, verbose_name='Адрес доставки')),
+                ('total_price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Сумма заказа')),
+                ('comment', models.TextField(blank=True, verbose_name='Комментарий к заказу')),
+                ('registration_date', models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Дата регистрации')),
+                ('call_date', models.DateTimeField(blank=True, null=True, verbose_name='Дата звонка')),
+                ('delivery_date', models.DateTimeField(blank=True, null=True, verbose_name='Дата доставки')),
+                ('items_count', models.PositiveIntegerField(default=0, verbose_name='Позиций в заказе')),
+                ('product_ids', models.TextField(blank=True, default='', verbose_name='Продукты заказа')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата переноса в архив')),
+                ('place', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_orders', to='foodcartapp.place', verbose_name='Место доставки')),
+                ('restaurant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_orders', to='foodcartapp.restaurant', verbose_name='Ресторан')),
+            ],
+            options={
+                'verbose_name': 'архивный заказ',
+                'verbose_name_plural': 'архивные заказы',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(verbose_name='Количество')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Сумма')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='foodcartapp.archivedorder', verbose_name='архивный заказ')),
+                ('product', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_order_items', to='foodcartapp.product', verbose_name='продукт')),
+            ],
+            options={
+                'verbose_name': 'позиция архивного заказа',
+                'verbose_name_plural': 'позиции архивных заказов',
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.15 on 2026-10-17 22:10
+
+from django.db import migrations
+from django.db.models.functions import Coalesce, Now
+
+
+def fill_registration_dates(apps, schema_editor):
+    # дата регистрации проставляется при каждом сохранении заказа, пустой она
+    # бывает только у старых заказов; берём ближайшую известную дату
+    Order = apps.get_model('foodcartapp', 'Order')
+    Order.objects.filter(registration_date__isnull=True).update(
+        registration_date=Coalesce('call_date', 'delivery_date', Now()),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0010_archived_orders'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_registration_dates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 3.2.15 on 2026-10-17 22:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # отдельно от заполнения: в PostgreSQL ALTER TABLE после UPDATE в той же
+    # транзакции может упасть на отложенных проверках внешних ключей
+
+    dependencies = [
+        ('foodcartapp', '0011_fill_order_registration_date'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='registration_date',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Дата регистрации'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.15 on 2026-10-17 22:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0012_order_registration_date_not_null'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='archivedorder',
+            name='registration_date',
+            field=models.DateTimeField(db_index=True, verbose_name='Дата регистрации'),
+        ),
+    ]
@@ -1,16 +1,10 @@
 import re
+from collections import defaultdict
 
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db.models import Count
-from django.http import Http404
-from django.shortcuts import get_object_or_404
+from django.db.models import Q
 from phonenumber_field.modelfields import PhoneNumberField
-from geopy import distance
-from requests import HTTPError
-
-from foodcartapp.get_geo import fetch_coordinates
-from star_burger import settings
 
 
 class Restaurant(models.Model):
@@ -28,6 +22,14 @@ class Restaurant(models.Model):
         max_length=50,
         blank=True,
     )
+    place = models.ForeignKey(
+        'Place',
+        verbose_name='место',
+        related_name='restaurants',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+    )
 
     class Meta:
         verbose_name = 'ресторан'
@@ -104,6 +106,19 @@ class Product(models.Model):
         return self.name
 
 
+class RestaurantMenuItemQuerySet(models.QuerySet):
+    def get_restaurants_by_product(self):
+        """
+        Индекс доступности меню за один запрос
+        :return: словарь {id продукта: множество id ресторанов, где он в продаже}
+        """
+        restaurants_by_product = defaultdict(set)
+        menu_items = self.filter(availability=True).values_list('restaurant', 'product')
+        for restaurant_id, product_id in menu_items:
+            restaurants_by_product[product_id].add(restaurant_id)
+        return restaurants_by_product
+
+
 class RestaurantMenuItem(models.Model):
     restaurant = models.ForeignKey(
         Restaurant,
@@ -123,6 +138,8 @@ class RestaurantMenuItem(models.Model):
         db_index=True
     )
 
+    objects = RestaurantMenuItemQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Пункт меню ресторана'
         verbose_name_plural = 'Пункты меню ресторана'
@@ -134,6 +151,34 @@ class RestaurantMenuItem(models.Model):
         return f"{self.restaurant.name} - {self.product.name}"
 
 
+class Banner(models.Model):
+    title = models.CharField(
+        'заголовок',
+        max_length=50,
+    )
+    image = models.ImageField(
+        'картинка'
+    )
+    text = models.CharField(
+        'текст',
+        max_length=200,
+        blank=True,
+    )
+    position = models.PositiveIntegerField(
+        'позиция',
+        default=0,
+        db_index=True,
+    )
+
+    class Meta:
+        verbose_name = 'баннер'
+        verbose_name_plural = 'баннеры'
+        ordering = ['position', 'id']
+
+    def __str__(self):
+        return self.title
+
+
 class Place(models.Model):
     name = models.CharField(
         'название',
@@ -142,16 +187,29 @@ class Place(models.Model):
         unique=True,
     )
     lon = models.FloatField(
-        'широта'
+        'широта',
+        null=True,
+        blank=True,
     )
     lat = models.FloatField(
-        'долгота'
+        'долгота',
+        null=True,
+        blank=True,
     )
 
     class Meta:
         verbose_name = 'место'
         verbose_name_plural = 'места'
 
+    def __str__(self):
+        return self.name
+
+    @property
+    def coordinates(self):
+        if self.lon is None or self.lat is None:
+            return None
+        return self.lon, self.lat
+
 
 def atoi(text):
     return int(text) if text.isdigit() else text
@@ -166,69 +224,29 @@ def natural_keys(text):
     return [atoi(c) for c in re.split(r'[+-]?([0-9]+(?:[.][0-9]*)?|[.][0-9]+)', text)]
 
 
-def get_place_coordinates(api_key, place):
-    try:
-        place = get_object_or_404(Place, name=place)
-        lon, lat = place.lon, place.lat
-        return lon, lat
-    except Http404:
-        lon, lat = fetch_coordinates(api_key, place)
-        Place.objects.create(name=place, lon=lon, lat=lat)
-        return lon, lat
-
-
-def get_distance(apikey, place_from, place_to):
-    """
-    Возвращает расстояние между двумя точками в км
-    :param apikey: ключ для yandex api
-    :param place_from: начальная точка
-    :param place_to: конечная точка
-    :return: расстояние в км
-    """
-    try:
-        coords_from = get_place_coordinates(apikey, place_from)
-        coords_to = get_place_coordinates(apikey, place_to)
-        dist = distance.distance(coords_from, coords_to).km
-        return dist
-    except HTTPError as e:
-        return 0
-
-
 class OrderQuerySet(models.QuerySet):
+    def unprocessed(self):
+        return self.exclude(status=Order.READY)
+
+    def in_keyset_order(self):
+        return self.order_by('-status', '-registration_date', '-id')
+
+    def after(self, status, registration_date, order_id):
+        """
+        Заказы, идущие после указанного в порядке in_keyset_order
+        """
+        return self.filter(
+            Q(status__lt=status)
+            | Q(status=status, registration_date__lt=registration_date)
+            | Q(status=status, registration_date=registration_date, id__lt=order_id)
+        )
+
     def prefetch_items(self):
-        apikey = settings.YANDEX_KEY
-        orders = Order.objects.exclude(status=Order.READY).order_by('-status').select_related(
-            'restaurant').prefetch_related('items', 'items__product').annotate(product_count=Count('items__product'))
-
-        menu_items = RestaurantMenuItem.objects.filter(availability=True).values('restaurant', 'product')
-        restaurants = Restaurant.objects.in_bulk([item['restaurant'] for item in menu_items])
-
-        for order in orders:
-            if order.restaurant is None:
-                order_restaurants = []
-                order_products = order.items.all()
-                for restaurant in restaurants:
-                    restaurants_possible = True
-                    for order_product in order_products:
-                        restaurants_for_product = menu_items.filter(product=order_product.product,
-                                                                    restaurant=restaurants[restaurant])
-                        if not restaurants_for_product:
-                            restaurants_possible = False
-                    if restaurants_possible:
-                        div_distance = get_distance(apikey, order.address, restaurants[restaurant].address)
-                        order_restaurants.append({
-                            'restaurant': restaurants[restaurant],
-                            'distance': div_distance
-                        })
-                delivery_restaurants = []
-                if order_restaurants:
-                    for restaurant in order_restaurants:
-                        div_distance = restaurant['distance']
-                        restaurant["restaurant"].distance = div_distance
-                        delivery_restaurants.append(f'{restaurant["restaurant"].name} - {round(div_distance, 0)}')
-                delivery_restaurants.sort(key=natural_keys)
-                order.restaurant_possible = delivery_restaurants
-        return orders
+        candidates = OrderCandidate.objects.select_related('restaurant').order_by('distance_km', 'restaurant__name')
+        return (
+            self.select_related('restaurant', 'place')
+            .prefetch_related(models.Prefetch('candidates', queryset=candidates))
+        )
 
 
 class Order(models.Model):
@@ -256,6 +274,7 @@ class Order(models.Model):
         (DELIVERY, 'Доставка'),
         (READY, 'Доставлен'),
     ]
+    IN_FLIGHT_STATUSES = [COOKING, DELIVERY]
     status = models.CharField(
         'Статус заказа',
         choices=ORDER_STATUS,
@@ -294,7 +313,7 @@ class Order(models.Model):
         blank=True, verbose_name='Комментарий к заказу'
     )
     registration_date = models.DateTimeField(
-        blank=True, null=True, verbose_name='Дата регистрации', db_index=True, auto_now=True
+        blank=True, verbose_name='Дата регистрации', db_index=True, auto_now=True
     )
     call_date = models.DateTimeField(
         blank=True, null=True, verbose_name='Дата звонка', db_index=True
@@ -310,14 +329,42 @@ class Order(models.Model):
         null=True,
         on_delete=models.CASCADE
     )
+    place = models.ForeignKey(
+        Place,
+        verbose_name='Место доставки',
+        related_name='orders',
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL
+    )
+    # сводка по позициям заказа, поддерживается сигналами OrderItem, см. foodcartapp/summaries.py
+    items_count = models.PositiveIntegerField(
+        'Позиций в заказе',
+        default=0,
+    )
+    product_ids = models.TextField(
+        'Продукты заказа',
+        blank=True,
+        default='',
+        help_text='id продуктов через запятую по возрастанию',
+    )
     objects = OrderQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Заказ'
         verbose_name_plural = 'Заказы'
+        indexes = [
+            models.Index(fields=['status', 'registration_date', 'id'], name='order_keyset_idx'),
+        ]
 
     def __str__(self):
-        return f'{self.firstname} {self.phone_number}'
+        return f'{self.firstname} {self.phonenumber}'
+
+    def save(self, *args, **kwargs):
+        # в транзакции, чтобы строка заказа, заблокированная в pre_save ради
+        # счётчика загрузки ресторанов, оставалась заблокированной до коммита
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
 
     def get_total_cost(self):
         # общая сумма заказа
@@ -362,7 +409,134 @@ class OrderItem(models.Model):
         unique_together = ('order', 'product')
 
     def __str__(self):
-        return f"{self.order.phone_number} - {self.product.name}"
+        return f"{self.order.phonenumber} - {self.product.name}"
 
     def get_cost(self):
         return self.product.price * self.quantity
+
+
+class OrderCandidate(models.Model):
+    order = models.ForeignKey(
+        Order,
+        related_name='candidates',
+        verbose_name='заказ',
+        on_delete=models.CASCADE,
+    )
+    restaurant = models.ForeignKey(
+        Restaurant,
+        related_name='order_candidates',
+        verbose_name='ресторан',
+        on_delete=models.CASCADE,
+    )
+    distance_km = models.FloatField(
+        'расстояние, км',
+        null=True,
+        blank=True,
+    )
+
+    class Meta:
+        verbose_name = 'ресторан-кандидат для заказа'
+        verbose_name_plural = 'рестораны-кандидаты для заказов'
+        unique_together = [
+            ['order', 'restaurant']
+        ]
+
+
+class RestaurantLoad(models.Model):
+    """
+    Сколько заказов ресторан сейчас готовит и доставляет. Счётчик меняется
+    сигналами при сохранении и удалении заказов, а не пересчитывается по таблице
+    заказов. Отдельная таблица, чтобы сохранение ресторана в админке не затирало счётчик.
+    """
+
+    restaurant = models.OneToOneField(
+        Restaurant,
+        primary_key=True,
+        related_name='load',
+        verbose_name='ресторан',
+        on_delete=models.CASCADE,
+    )
+    in_flight_orders = models.IntegerField(
+        'заказов готовится и доставляется',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'загрузка ресторана'
+        verbose_name_plural = 'загрузка ресторанов'
+
+    def __str__(self):
+        return f'{self.restaurant_id}: {self.in_flight_orders}'
+
+
+class ArchivedOrder(models.Model):
+    """
+    Доставленный заказ, перенесённый из таблицы заказов командой archive_orders.
+    id совпадает с id исходного заказа. Архив только для чтения: на него не
+    ссылаются кандидаты и счётчики, а сигналы заказов на него не подписаны.
+    """
+
+    id = models.IntegerField('id заказа', primary_key=True)
+    pay = models.CharField('Способ оплаты', choices=Order.PAY_TYPE, max_length=20)
+    status = models.CharField('Статус заказа', choices=Order.ORDER_STATUS, max_length=20)
+    firstname = models.CharField('Имя', max_length=90)
+    lastname = models.CharField('Фамилия', max_length=100, db_index=True)
+    phonenumber = PhoneNumberField(verbose_name='Телефон', db_index=True)
+    address = models.CharField('Адрес доставки', max_length=100)
+    total_price = models.DecimalField('Сумма заказа', max_digits=10, decimal_places=2)
+    comment = models.TextField('Комментарий к заказу', blank=True)
+    registration_date = models.DateTimeField('Дата регистрации', db_index=True)
+    call_date = models.DateTimeField('Дата звонка', blank=True, null=True)
+    delivery_date = models.DateTimeField('Дата доставки', blank=True, null=True)
+    # удаление ресторана или места не должно стирать историю заказов
+    restaurant = models.ForeignKey(
+        Restaurant,
+        verbose_name='Ресторан',
+        related_name='archived_orders',
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+    )
+    place = models.ForeignKey(
+        Place,
+        verbose_name='Место доставки',
+        related_name='archived_orders',
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+    )
+    items_count = models.PositiveIntegerField('Позиций в заказе', default=0)
+    product_ids = models.TextField('Продукты заказа', blank=True, default='')
+    archived_at = models.DateTimeField('Дата переноса в архив', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'архивный заказ'
+        verbose_name_plural = 'архивные заказы'
+
+    def __str__(self):
+        return f'{self.firstname} {self.phonenumber}'
+
+
+class ArchivedOrderItem(models.Model):
+    order = models.ForeignKey(
+        ArchivedOrder,
+        related_name='items',
+        verbose_name='архивный заказ',
+        on_delete=models.CASCADE,
+    )
+    product = models.ForeignKey(
+        Product,
+        related_name='archived_order_items',
+        verbose_name='продукт',
+        null=True,
+        on_delete=models.SET_NULL,
+    )
+    quantity = models.IntegerField('Количество')
+    price = models.DecimalField('Сумма', max_digits=10, decimal_places=2)
+
+    class Meta:
+        verbose_name = 'позиция архивного заказа'
+        verbose_name_plural = 'позиции архивных заказов'
+
+    def __str__(self):
+        return f'{self.order_id} - {self.product_id}'
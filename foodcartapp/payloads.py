@@ -0,0 +1,120 @@
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from foodcartapp.models import Banner, Product
+
+
+class CachedPayload:
+    """
+    JSON-ответ, собранный один раз и хранящийся в кэше Django под ключом версии.
+    Версия меняется при invalidate(), поэтому устаревшие записи просто перестают
+    читаться. Пока версия не изменилась, ответ отдаётся без запросов к БД,
+    а клиенты с совпадающим ETag получают 304. Записи живут не дольше
+    CACHE_ENTRY_TIMEOUT секунд: если кэш не общий для воркеров, чужой
+    invalidate() дойдёт до воркера хотя бы так.
+    """
+
+    def __init__(self, name, build, max_age=0):
+        self.name = name
+        self.build = build
+        self.max_age = max_age
+
+    @property
+    def version_key(self):
+        return f'{self.name}:version'
+
+    def invalidate(self):
+        version = f'{time.time():.6f}'
+        cache.set(self.version_key, version, timeout=None)
+        return version
+
+    def get_entry(self):
+        version = cache.get(self.version_key) or self.invalidate()
+        entry_key = f'{self.name}:{version}'
+        entry = cache.get(entry_key)
+        if entry is None:
+            body = json.dumps(
+                self.build(),
+                cls=DjangoJSONEncoder,
+                ensure_ascii=False,
+                separators=(',', ':'),
+            ).encode()
+            entry = {
+                'body': body,
+                'etag': f'"{hashlib.sha1(body).hexdigest()}"',
+                'last_modified': int(float(version)),
+            }
+            cache.set(entry_key, entry, timeout=settings.CACHE_ENTRY_TIMEOUT)
+        return entry
+
+    def get_response(self, request):
+        entry = self.get_entry()
+        response = get_conditional_response(
+            request,
+            etag=entry['etag'],
+            last_modified=entry['last_modified'],
+        )
+        if response is None:
+            response = HttpResponse(entry['body'], content_type='application/json')
+        response['ETag'] = entry['etag']
+        response['Last-Modified'] = http_date(entry['last_modified'])
+        patch_cache_control(response, public=True, max_age=self.max_age)
+        return response
+
+
+def dump_products():
+    products = Product.objects.select_related('category').available()
+
+    dumped_products = []
+    for product in products:
+        dumped_product = {
+            'id': product.id,
+            'name': product.name,
+            'price': product.price,
+            'special_status': product.special_status,
+            'description': product.description,
+            'category': {
+                'id': product.category.id,
+                'name': product.category.name,
+            } if product.category else None,
+            'image': product.image.url,
+            'restaurant': {
+                'id': product.id,
+                'name': product.name,
+            }
+        }
+        dumped_products.append(dumped_product)
+    return dumped_products
+
+
+product_catalog = CachedPayload(
+    'product_catalog',
+    build=dump_products,
+    max_age=settings.PRODUCT_CATALOG_MAX_AGE,
+)
+
+
+def dump_banners():
+    return [
+        {
+            'title': banner.title,
+            'src': banner.image.url,
+            'text': banner.text,
+        }
+        for banner in Banner.objects.all()
+    ]
+
+
+banners = CachedPayload(
+    'banners',
+    build=dump_banners,
+    max_age=settings.BANNERS_MAX_AGE,
+)
@@ -1,41 +1,148 @@
-
-from django.db import transaction
+from django.db import connection, transaction
 from rest_framework import serializers
 
-from .models import Order, OrderItem
+from .candidates import update_order_candidates
+from .geocoding import enqueue_geocoding
+from .models import Order, OrderItem, Product
+from .signals import orders_created
+from .summaries import set_order_summary
+
+
+class PrefetchedProductField(serializers.PrimaryKeyRelatedField):
+    """
+    Ищет продукт в словаре context['products'], если продукты загружены заранее,
+    иначе делает обычный запрос к БД
+    """
+
+    def to_internal_value(self, data):
+        products = self.context.get('products')
+        if products is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            product_id = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if product_id not in products:
+            self.fail('does_not_exist', pk_value=data)
+        return products[product_id]
 
 
 class OrderProductSerializer(serializers.ModelSerializer):
+    product = PrefetchedProductField(queryset=Product.objects.all())
+
     class Meta:
         model = OrderItem
         fields = ('product', 'quantity')
 
 
+class OrderListSerializer(serializers.ListSerializer):
+    @staticmethod
+    def prefetch_products(orders_data):
+        """
+        Загружает одним запросом все продукты, упомянутые в сырых данных заказов
+        :return: словарь {id продукта: Product} для context['products']
+        """
+        product_ids = set()
+        for order_data in orders_data:
+            if not isinstance(order_data, dict) or not isinstance(order_data.get('products'), list):
+                continue
+            for item in order_data['products']:
+                if not isinstance(item, dict):
+                    continue
+                try:
+                    product_ids.add(int(item.get('product')))
+                except (TypeError, ValueError):
+                    continue
+        return Product.objects.in_bulk(product_ids)
+
+    def validate_each(self):
+        """
+        Проверяет заказы по отдельности, чтобы ошибка в одном не отменяла остальные
+        :return: список пар (validated_data, None) или (None, ошибки) в порядке заказов
+        """
+        results = []
+        for order_data in self.initial_data:
+            try:
+                results.append((self.child.run_validation(order_data), None))
+            except serializers.ValidationError as error:
+                results.append((None, error.detail))
+        return results
+
+    @transaction.atomic
+    def create(self, validated_data):
+        orders = [
+            Order(
+                phonenumber=order_data['phonenumber'],
+                firstname=order_data['firstname'],
+                lastname=order_data['lastname'],
+                address=order_data['address'],
+                status=Order.NEW,
+                total_price=order_data['total_price'],
+            )
+            for order_data in validated_data
+        ]
+        for order, order_data in zip(orders, validated_data):
+            set_order_summary(order, [fields['product'].id for fields in order_data['products']])
+        enqueue_geocoding(orders)
+        if connection.features.can_return_rows_from_bulk_insert:
+            Order.objects.bulk_create(orders)
+        else:
+            # без RETURNING (SQLite) bulk_create не проставляет id, а они нужны для позиций заказа
+            for order in orders:
+                order.save()
+
+        items = [
+            OrderItem(order=order, **fields)
+            for order, order_data in zip(orders, validated_data)
+            for fields in order_data['products']
+        ]
+        OrderItem.objects.bulk_create(items)
+        # bulk_create не отправляет сигналы, кандидатов считаем явно
+        order_ids = [order.id for order in orders]
+        transaction.on_commit(lambda: update_order_candidates(order_ids))
+        orders_created.send(sender=Order, order_ids=order_ids)
+        return orders
+
+
 class OrderSerializer(serializers.ModelSerializer):
     products = OrderProductSerializer(many=True, allow_empty=False, write_only=True)
 
     class Meta:
         model = Order
         fields = ('products', 'phonenumber', 'firstname', 'lastname', 'address')
+        list_serializer_class = OrderListSerializer
+
+    def validate_products(self, products):
+        product_ids = [fields['product'].id for fields in products]
+        if len(product_ids) != len(set(product_ids)):
+            raise serializers.ValidationError('Продукты в заказе не должны повторяться')
+        return products
+
+    def validate(self, attrs):
+        for fields in attrs['products']:
+            fields['price'] = fields['product'].price * fields['quantity']
+        attrs['total_price'] = sum(fields['price'] for fields in attrs['products'])
+        return attrs
 
     @transaction.atomic
     def create(self, validated_data):
-        order = Order.objects.create(
+        order = Order(
             phonenumber=validated_data['phonenumber'],
             firstname=validated_data['firstname'],
             lastname=validated_data['lastname'],
             address=validated_data['address'],
+            total_price=validated_data['total_price'],
             status=Order.NEW
         )
-        products = validated_data['products']
+        set_order_summary(order, [fields['product'].id for fields in validated_data['products']])
+        enqueue_geocoding([order])
+        order.save()
 
-        items = [OrderItem(
-            order=order,
-            price=fields['product'].price * fields['quantity'],
-            **fields
-        ) for fields in products]
+        items = [
+            OrderItem(order=order, **fields)
+            for fields in validated_data['products']
+        ]
         OrderItem.objects.bulk_create(items)
-
-        order.total_price = order.get_total_cost()
-        order.save()
         return order
@@ -0,0 +1,190 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+
+from foodcartapp.archive import is_archiving
+from foodcartapp.candidates import (
+    rebuild_order_candidates, schedule_candidates_update, schedule_candidates_update_for_products,
+    update_order_candidates,
+)
+from foodcartapp.loads import change_in_flight_orders, is_in_flight
+from foodcartapp.models import (
+    Banner, Order, OrderItem, Place, Product, ProductCategory, Restaurant, RestaurantMenuItem,
+)
+from foodcartapp.payloads import banners, product_catalog
+from foodcartapp.spatial import invalidate_restaurant_index
+from foodcartapp.summaries import order_items_changed
+
+# Отправляется после bulk_create заказов, для которых post_save не срабатывает.
+# Аргументы: order_ids
+orders_created = Signal()
+
+# Отправляется после автоматического назначения ресторанов заказам через bulk_update.
+# Аргументы: order_ids
+orders_dispatched = Signal()
+
+# Отправляется после bulk-импорта меню, для которого post_save не срабатывает.
+# Аргументы: items — список (id ресторана, id продукта, в продаже ли)
+menu_imported = Signal()
+
+# Индекс ресторанов и кандидаты обновляются после коммита: при откате транзакции
+# они не должны увидеть несохранённые изменения. Обработчики индекса объявлены
+# раньше обработчиков кандидатов, поэтому кандидаты считаются по свежему индексу.
+
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+@receiver(post_save, sender=RestaurantMenuItem)
+@receiver(post_delete, sender=RestaurantMenuItem)
+def invalidate_indexed_restaurants(sender, **kwargs):
+    transaction.on_commit(invalidate_restaurant_index)
+
+
+@receiver(post_save, sender=Place)
+def update_indexed_place(sender, instance, created, **kwargs):
+    if created:
+        return
+    has_restaurants = instance.restaurants.exists()
+    if has_restaurants:
+        transaction.on_commit(invalidate_restaurant_index)
+    if has_restaurants or instance.orders.exists():
+        transaction.on_commit(rebuild_order_candidates)
+
+
+@receiver(post_save, sender=Order)
+def update_candidates_for_order(sender, instance, **kwargs):
+    transaction.on_commit(lambda: update_order_candidates([instance.id]))
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def update_candidates_for_order_item(sender, instance, **kwargs):
+    if is_archiving():
+        return
+    schedule_candidates_update([instance.order_id])
+
+
+@receiver(post_save, sender=RestaurantMenuItem)
+@receiver(post_delete, sender=RestaurantMenuItem)
+def update_candidates_for_menu_item(sender, instance, **kwargs):
+    schedule_candidates_update_for_products([instance.product_id])
+
+
+@receiver(post_init, sender=Restaurant)
+def remember_restaurant_place(sender, instance, **kwargs):
+    instance._saved_place_id = instance.__dict__.get('place_id')
+
+
+@receiver(post_save, sender=Restaurant)
+def update_candidates_for_restaurant(sender, instance, created, **kwargs):
+    # новый ресторан или новое место могут попасть в ближайшие к любому заказу,
+    # а смена названия или телефона кандидатов не меняет
+    place_changed = instance.place_id != instance._saved_place_id
+    instance._saved_place_id = instance.place_id
+    if created or place_changed:
+        transaction.on_commit(rebuild_order_candidates)
+
+
+@receiver(pre_delete, sender=Restaurant)
+def remember_restaurant_orders(sender, instance, **kwargs):
+    # пересчитываются только заказы, для которых ресторан был кандидатом,
+    # а их строки кандидатов удалятся каскадно вместе с рестораном
+    instance._candidate_order_ids = list(instance.order_candidates.values_list('order', flat=True))
+
+
+@receiver(post_delete, sender=Restaurant)
+def update_candidates_for_deleted_restaurant(sender, instance, **kwargs):
+    order_ids = instance._candidate_order_ids
+    if order_ids:
+        transaction.on_commit(lambda: update_order_candidates(order_ids))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=ProductCategory)
+@receiver(post_save, sender=RestaurantMenuItem)
+@receiver(post_delete, sender=RestaurantMenuItem)
+def invalidate_product_catalog(sender, **kwargs):
+    # после коммита, иначе параллельный запрос может закэшировать старые данные под новой версией
+    transaction.on_commit(product_catalog.invalidate)
+
+
+@receiver(post_save, sender=Banner)
+@receiver(post_delete, sender=Banner)
+def invalidate_banners(sender, **kwargs):
+    transaction.on_commit(banners.invalidate)
+
+
+# Счётчик заказов в работе меняется в той же транзакции, что и заказ.
+# Прежние ресторан и статус перед сохранением перечитываются из строки заказа
+# под блокировкой: при двух параллельных сохранениях одного заказа второе
+# дождётся первого и увидит уже его статус, а не снимок на момент загрузки.
+# Поля объекта читаются из __dict__: у заказа, загруженного через only(),
+# обращение к отложенному полю стоило бы запроса.
+
+def get_saved_load_key(instance):
+    return instance.__dict__.get('restaurant_id'), instance.__dict__.get('status')
+
+
+def writes_load_fields(update_fields):
+    return update_fields is None or bool({'restaurant', 'restaurant_id', 'status'} & set(update_fields))
+
+
+@receiver(post_init, sender=Order)
+def remember_order_load(sender, instance, **kwargs):
+    instance._saved_load_key = get_saved_load_key(instance)
+
+
+@receiver(pre_save, sender=Order)
+def lock_order_load(sender, instance, update_fields, **kwargs):
+    if instance.pk is None or not writes_load_fields(update_fields):
+        return
+    saved_load_key = (
+        Order.objects
+        .select_for_update()
+        .filter(pk=instance.pk)
+        .values_list('restaurant_id', 'status')
+        .first()
+    )
+    instance._saved_load_key = saved_load_key or (None, None)
+
+
+@receiver(post_save, sender=Order)
+def update_restaurant_load(sender, instance, created, update_fields, **kwargs):
+    old_restaurant_id, old_status = (None, None) if created else instance._saved_load_key
+    new_restaurant_id, new_status = get_saved_load_key(instance)
+    if update_fields is not None:
+        if 'restaurant' not in update_fields and 'restaurant_id' not in update_fields:
+            new_restaurant_id = old_restaurant_id
+        if 'status' not in update_fields:
+            new_status = old_status
+    instance._saved_load_key = new_restaurant_id, new_status
+
+    was_in_flight = is_in_flight(old_restaurant_id, old_status)
+    in_flight = is_in_flight(new_restaurant_id, new_status)
+    if (was_in_flight, old_restaurant_id) == (in_flight, new_restaurant_id):
+        return
+    if was_in_flight:
+        change_in_flight_orders(old_restaurant_id, -1)
+    if in_flight:
+        change_in_flight_orders(new_restaurant_id, 1)
+
+
+@receiver(post_delete, sender=Order)
+def release_restaurant_load(sender, instance, **kwargs):
+    restaurant_id, status = instance._saved_load_key
+    if is_in_flight(restaurant_id, status):
+        change_in_flight_orders(restaurant_id, -1)
+
+
+# Сводка заказа пересчитывается в той же транзакции, что и позиция, поэтому
+# кандидаты, которые считаются после коммита, видят уже свежий набор продуктов.
+# bulk_create позиций сигналов не отправляет, сводку заполняет создающий код.
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def update_order_summary(sender, instance, **kwargs):
+    if is_archiving():
+        return
+    order_items_changed(instance.order_id)
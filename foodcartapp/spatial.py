@@ -0,0 +1,170 @@
+import math
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from foodcartapp.distances import get_distance_matrix
+from foodcartapp.models import Restaurant, RestaurantMenuItem
+
+INDEX_VERSION_CACHE_KEY = 'restaurant_index_version'
+KM_PER_DEGREE = 111.0
+
+
+class RestaurantIndex:
+    """
+    Сетка ресторанов по координатам вместе с индексом доступности меню.
+    Отвечает на вопрос «k ближайших ресторанов, где есть все эти продукты»,
+    не перебирая все рестораны сети.
+    """
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = defaultdict(set)
+        self.coordinates = {}
+        self.restaurant_ids = set()
+        self.restaurants_by_product = defaultdict(set)
+
+    @classmethod
+    def build(cls, cell_size):
+        index = cls(cell_size)
+        for restaurant in Restaurant.objects.select_related('place').only('id', 'place'):
+            index.set_restaurant(restaurant.id, restaurant.place.coordinates if restaurant.place else None)
+        index.restaurants_by_product = RestaurantMenuItem.objects.get_restaurants_by_product()
+        return index
+
+    def get_cell(self, coordinates):
+        lat, lon = coordinates
+        return math.floor(lat / self.cell_size), math.floor(lon / self.cell_size)
+
+    def set_restaurant(self, restaurant_id, coordinates):
+        self.remove_restaurant(restaurant_id, keep_menu=True)
+        self.restaurant_ids.add(restaurant_id)
+        if coordinates:
+            self.coordinates[restaurant_id] = coordinates
+            self.cells[self.get_cell(coordinates)].add(restaurant_id)
+
+    def remove_restaurant(self, restaurant_id, keep_menu=False):
+        self.restaurant_ids.discard(restaurant_id)
+        coordinates = self.coordinates.pop(restaurant_id, None)
+        if coordinates:
+            cell = self.get_cell(coordinates)
+            self.cells[cell].discard(restaurant_id)
+            if not self.cells[cell]:
+                del self.cells[cell]
+        if not keep_menu:
+            for restaurant_ids in self.restaurants_by_product.values():
+                restaurant_ids.discard(restaurant_id)
+
+    def get_capable(self, product_ids):
+        """
+        :return: множество id ресторанов, где в продаже все продукты
+        """
+        return self.restaurant_ids.intersection(*(
+            self.restaurants_by_product.get(product_id, ()) for product_id in product_ids
+        ))
+
+    def nearest(self, coordinates, product_ids, k):
+        """
+        Ищет k ближайших ресторанов, где в продаже все продукты.
+        Обходит ячейки сетки кольцами от точки доставки и останавливается,
+        как только непросмотренные ячейки заведомо дальше k-го найденного ресторана.
+        :param coordinates: (широта, долгота) точки доставки
+        :return: список (id ресторана, расстояние в км) по возрастанию расстояния
+        """
+        capable_ids = self.get_capable(product_ids)
+        located_ids = [restaurant_id for restaurant_id in capable_ids if restaurant_id in self.coordinates]
+        if not located_ids or not k:
+            return []
+        if len(located_ids) <= k:
+            return self.get_distances(coordinates, located_ids)[:k]
+
+        center_row, center_column = self.get_cell(coordinates)
+        lat_km = KM_PER_DEGREE * self.cell_size
+        found = []
+        seen_count = 0
+        ring = 0
+        while seen_count < len(located_ids):
+            ring_ids = [
+                restaurant_id
+                for cell in self.get_ring_cells(center_row, center_column, ring)
+                for restaurant_id in self.cells.get(cell, ())
+                if restaurant_id in capable_ids
+            ]
+            seen_count += len(ring_ids)
+            found.extend(self.get_distances(coordinates, ring_ids))
+            found.sort(key=lambda item: item[1])
+            # всё за пределами просмотренных колец не ближе ring клеток по широте или долготе
+            farthest_lat = min(abs(coordinates[0]) + (ring + 1) * self.cell_size, 90)
+            unseen_km = ring * lat_km * max(math.cos(math.radians(farthest_lat)), 0.01)
+            if len(found) >= k and found[k - 1][1] <= unseen_km:
+                break
+            ring += 1
+        return found[:k]
+
+    def get_distances(self, coordinates, restaurant_ids):
+        if not restaurant_ids:
+            return []
+        distances = get_distance_matrix(
+            [coordinates],
+            [self.coordinates[restaurant_id] for restaurant_id in restaurant_ids],
+        )[0]
+        return sorted(zip(restaurant_ids, map(float, distances)), key=lambda item: item[1])
+
+    @staticmethod
+    def get_ring_cells(center_row, center_column, ring):
+        if not ring:
+            return [(center_row, center_column)]
+        cells = []
+        for offset in range(-ring, ring + 1):
+            cells.append((center_row - ring, center_column + offset))
+            cells.append((center_row + ring, center_column + offset))
+        for offset in range(-ring + 1, ring):
+            cells.append((center_row + offset, center_column - ring))
+            cells.append((center_row + offset, center_column + ring))
+        return cells
+
+
+_index = None
+_index_version = None
+_index_built_at = 0
+_index_lock = threading.RLock()
+
+
+def get_restaurant_index():
+    """
+    Индекс ресторанов текущего процесса. Перестраивается целиком, если версия индекса
+    в общем кэше сменилась, то есть рестораны или меню изменил любой процесс, а также
+    раз в RESTAURANT_INDEX_TTL секунд.
+    """
+    global _index, _index_version, _index_built_at
+    with _index_lock:
+        version = cache.get(INDEX_VERSION_CACHE_KEY)
+        expired = time.monotonic() - _index_built_at > settings.RESTAURANT_INDEX_TTL
+        if _index is None or version is None or version != _index_version or expired:
+            _index_version = version or _bump_version()
+            _index = RestaurantIndex.build(settings.RESTAURANT_INDEX_CELL_SIZE)
+            _index_built_at = time.monotonic()
+        return _index
+
+
+def _bump_version():
+    version = uuid.uuid4().hex
+    cache.set(INDEX_VERSION_CACHE_KEY, version, timeout=None)
+    return version
+
+
+def invalidate_restaurant_index():
+    """
+    Сбрасывает индексы во всех процессах после изменения ресторанов или меню.
+    Индекс не правится на месте: два процесса, одновременно поправившие свои копии,
+    могли бы оставить каждый без чужого изменения, а устаревший индекс
+    сохраняется в кандидатах заказов. Перестройка стоит двух запросов.
+    """
+    global _index
+    with _index_lock:
+        _index = None
+        _bump_version()
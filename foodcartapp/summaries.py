@@ -0,0 +1,129 @@
+import contextvars
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import transaction
+
+from .models import Order, OrderItem
+
+BATCH_SIZE = 1000
+
+_deferred_order_ids = contextvars.ContextVar('deferred_order_ids', default=None)
+
+
+def dump_product_ids(product_ids):
+    """
+    :return: подпись набора продуктов для Order.product_ids: id через запятую по возрастанию
+    """
+    return ','.join(str(product_id) for product_id in sorted(set(product_ids)))
+
+
+def load_product_ids(signature):
+    """
+    :return: множество id продуктов из подписи Order.product_ids
+    """
+    return {int(product_id) for product_id in signature.split(',')} if signature else set()
+
+
+def set_order_summary(order, product_ids):
+    """
+    Заполняет сводку ещё не сохранённого заказа, например перед bulk_create позиций,
+    для которых сигналы не отправляются
+    """
+    order.items_count = len(product_ids)
+    order.product_ids = dump_product_ids(product_ids)
+
+
+def count_order_summaries(order_ids):
+    """
+    :return: словарь {id заказа: (позиций, подпись продуктов)}, посчитанный по позициям
+    """
+    products_by_order = defaultdict(list)
+    order_items = OrderItem.objects.filter(order__in=order_ids).values_list('order', 'product')
+    for order_id, product_id in order_items:
+        products_by_order[order_id].append(product_id)
+    return {
+        order_id: (len(products_by_order[order_id]), dump_product_ids(products_by_order[order_id]))
+        for order_id in order_ids
+    }
+
+
+def save_order_summaries(summaries, batch_size=BATCH_SIZE):
+    """
+    :param summaries: словарь {id заказа: (позиций, подпись продуктов)}
+    """
+    orders = [
+        Order(id=order_id, items_count=items_count, product_ids=product_ids)
+        for order_id, (items_count, product_ids) in summaries.items()
+    ]
+    Order.objects.bulk_update(orders, ['items_count', 'product_ids'], batch_size=batch_size)
+
+
+def update_order_summaries(order_ids):
+    """
+    Пересчитывает сводку заказов по их позициям
+    """
+    save_order_summaries(count_order_summaries(set(order_ids)))
+
+
+def order_items_changed(order_id):
+    """
+    Пересчитывает сводку заказа после изменения его позиции,
+    а внутри defer_order_summaries — откладывает пересчёт до выхода из блока
+    """
+    deferred_order_ids = _deferred_order_ids.get()
+    if deferred_order_ids is None:
+        update_order_summaries([order_id])
+    else:
+        deferred_order_ids.add(order_id)
+
+
+@contextmanager
+def defer_order_summaries():
+    """
+    Пересчитывает сводку один раз на заказ после сохранения нескольких позиций,
+    например инлайнов в админке, а не после каждой позиции
+    """
+    deferred_order_ids = set()
+    token = _deferred_order_ids.set(deferred_order_ids)
+    try:
+        yield
+    finally:
+        _deferred_order_ids.reset(token)
+    if deferred_order_ids:
+        update_order_summaries(deferred_order_ids)
+
+
+def check_order_summaries(fix=False, batch_size=BATCH_SIZE):
+    """
+    Сверяет сводку заказов с позициями пачками по batch_size заказов.
+    Заказы пачки блокируются только на время её проверки.
+    :return: словарь {id заказа: (сводка в заказе, настоящая сводка)} для расходящихся
+    """
+    drift = {}
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            orders = Order.objects.filter(id__gt=last_id).order_by('id')
+            if fix:
+                orders = orders.select_for_update()
+            stored = {
+                order_id: (items_count, product_ids)
+                for order_id, items_count, product_ids
+                in orders.values_list('id', 'items_count', 'product_ids')[:batch_size]
+            }
+            if not stored:
+                break
+            batch_drift = {
+                order_id: (stored[order_id], summary)
+                for order_id, summary in count_order_summaries(list(stored)).items()
+                if stored[order_id] != summary
+            }
+            if fix:
+                save_order_summaries(
+                    {order_id: summary for order_id, (saved, summary) in batch_drift.items()},
+                    batch_size,
+                )
+        drift.update(batch_drift)
+        last_id = max(stored)
+    return drift
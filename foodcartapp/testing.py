@@ -0,0 +1,76 @@
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .benchmark import seed_database
+from .geocoder_stub import GeocoderStub
+
+
+class QueryCountTestCase(TestCase):
+    """
+    Проверяет, что число SQL-запросов представления не растёт вместе с данными.
+    Каждый размер из fixture_sizes заполняется заново внутри точки сохранения,
+    которая после замера откатывается. Геокодер заменяется заглушкой.
+    В замер входят и колбэки transaction.on_commit, отложенные запросом:
+    пересчёт кандидатов, события для менеджеров, обновление индекса ресторанов.
+
+        def test_view_orders(self):
+            self.assertQueryCountDoesNotGrow(lambda size: self.client.get('/manager/orders/'), max_queries=10)
+    """
+
+    fixture_sizes = (3, 15)
+
+    @classmethod
+    def setUpClass(cls):
+        cls.geocoder = GeocoderStub().__enter__()
+        cls.geocoder_settings = override_settings(GEOCODER_URL=cls.geocoder.url, GEOCODER_RATE_LIMIT=10000)
+        cls.geocoder_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.geocoder_settings.disable()
+        cls.geocoder.__exit__(None, None, None)
+
+    def populate(self, size):
+        """
+        Заполняет БД данными размера size, переопределяется в тестах при необходимости
+        """
+        seed_database(
+            restaurants_count=size,
+            products_count=size,
+            menu_size=size,
+            orders_count=size,
+            addresses_count=size,
+        )
+
+    def get_query_counts(self, request, populate=None):
+        """
+        :param request: функция от размера данных, отправляющая запрос и возвращающая ответ
+        :return: словарь {размер данных: число SQL-запросов}
+        """
+        populate = populate or self.populate
+        query_counts = {}
+        for size in self.fixture_sizes:
+            with transaction.atomic():
+                populate(size)
+                # кэши общие для всех размеров, а колбэки on_commit заполнения в TestCase не срабатывают
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    with self.captureOnCommitCallbacks(execute=True):
+                        response = request(size)
+                self.assertLess(response.status_code, 400)
+                query_counts[size] = len(queries)
+                transaction.set_rollback(True)
+        return query_counts
+
+    def assertQueryCountDoesNotGrow(self, request, max_queries, populate=None):
+        query_counts = self.get_query_counts(request, populate)
+        self.assertEqual(
+            len(set(query_counts.values())),
+            1,
+            f'Число SQL-запросов растёт вместе с данными (N+1): {query_counts}',
+        )
+        self.assertLessEqual(max(query_counts.values()), max_queries)
@@ -0,0 +1,810 @@
+import csv
+import io
+import json
+import math
+import os
+import random
+import tempfile
+import time
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from unittest import mock
+
+import numpy as np
+import requests
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from geopy import distance as geopy_distance
+
+from . import async_views
+from .archive import archive_orders
+from .candidates import defer_candidate_updates, rebuild_order_candidates
+from .checks import check_shared_cache
+from .dispatch import dispatch_orders, plan_dispatch
+from .distances import get_distance_matrix, refine_nearest
+from .export import export_orders
+from .geocoder_stub import GeocoderStub, get_stub_coordinates
+from .geocoding import TTLCache, get_places, get_places_coordinates, places_cache
+from .get_geo import GeocoderClient, TokenBucket
+from .loads import count_in_flight_orders, get_in_flight_orders, reconcile_restaurant_loads
+from .menu_import import import_menu_availability
+from .models import (
+    ArchivedOrder, ArchivedOrderItem, Banner, Order, OrderCandidate, OrderItem, Place, Product, Restaurant,
+    RestaurantMenuItem,
+)
+from .spatial import RestaurantIndex
+from .summaries import check_order_summaries, defer_order_summaries
+from .testing import QueryCountTestCase
+
+
+class RegisterOrderTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = [
+            Product.objects.create(name=f'Бургер {number}', price=100 + number, image='burger.jpg')
+            for number in range(20)
+        ]
+
+    def register_order(self, products):
+        return self.client.post('/api/order/', {
+            'products': [{'product': product.id, 'quantity': 2} for product in products],
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79001234567',
+            'address': 'Москва, Тверская 1',
+        }, content_type='application/json')
+
+    def test_total_price(self):
+        response = self.register_order(self.products[:3])
+
+        self.assertEqual(response.status_code, 200)
+        order = Order.objects.get()
+        self.assertEqual(order.total_price, Decimal(2 * (100 + 101 + 102)))
+        self.assertEqual(order.items.count(), 3)
+        self.assertEqual(order.items_count, 3)
+        self.assertEqual(order.product_ids, ','.join(str(product.id) for product in self.products[:3]))
+
+    def test_query_count_does_not_depend_on_basket_size(self):
+        with CaptureQueriesContext(connection) as small_basket_queries:
+            self.register_order(self.products[:1])
+        with CaptureQueriesContext(connection) as large_basket_queries:
+            self.register_order(self.products)
+
+        self.assertEqual(len(small_basket_queries), len(large_basket_queries))
+        inserts = [query for query in large_basket_queries if query['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 2)
+        self.assertFalse(any(query['sql'].startswith('UPDATE') for query in large_basket_queries))
+
+
+class ApiQueryCountTest(QueryCountTestCase):
+    def test_product_list_api(self):
+        self.assertQueryCountDoesNotGrow(lambda size: self.client.get('/api/products/'), max_queries=1)
+
+    def test_register_order(self):
+        def register_order(size):
+            return self.client.post('/api/order/', {
+                'products': [
+                    {'product': product_id, 'quantity': 1}
+                    for product_id in Product.objects.values_list('id', flat=True)[:size]
+                ],
+                'firstname': 'Иван',
+                'lastname': 'Петров',
+                'phonenumber': '+79001234567',
+                'address': 'Москва, ул. Тестовая, д. 1',
+            }, content_type='application/json')
+
+        # заказ и позиции, а после коммита — индекс ресторанов, кандидаты и событие для менеджеров
+        self.assertQueryCountDoesNotGrow(register_order, max_queries=17)
+
+
+class CachedPayloadTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def create_available_product(self):
+        product = Product.objects.create(name='Бургер', price=100, image='burger.jpg')
+        RestaurantMenuItem.objects.create(restaurant=Restaurant.objects.create(name='Ресторан'), product=product)
+        return product
+
+    def test_conditional_get(self):
+        self.create_available_product()
+        response = self.client.get('/api/products/')
+
+        by_etag = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=response['ETag'])
+        by_date = self.client.get('/api/products/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(by_etag.status_code, 304)
+        self.assertEqual(by_etag['ETag'], response['ETag'])
+        self.assertEqual(by_date.status_code, 304)
+
+    def test_product_save_changes_etag(self):
+        product = self.create_available_product()
+        first_response = self.client.get('/api/products/')
+        with self.captureOnCommitCallbacks(execute=True):
+            product.price = 150
+            product.save()
+        second_response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=first_response['ETag'])
+
+        self.assertEqual(second_response.status_code, 200)
+        self.assertNotEqual(second_response['ETag'], first_response['ETag'])
+        self.assertEqual(second_response.json()[0]['price'], '150.00')
+
+    def test_banner_edit_is_revalidated(self):
+        banner = Banner.objects.create(title='Акция', image='banner.jpg')
+        first_response = self.client.get('/api/banners/')
+        with self.captureOnCommitCallbacks(execute=True):
+            banner.text = 'Два бургера по цене одного'
+            banner.save()
+        second_response = self.client.get('/api/banners/', HTTP_IF_NONE_MATCH=first_response['ETag'])
+
+        self.assertIn('max-age=0', first_response['Cache-Control'])
+        self.assertEqual(second_response.status_code, 200)
+        self.assertNotEqual(second_response['ETag'], first_response['ETag'])
+        self.assertIn('Два бургера по цене одного', [banner['text'] for banner in second_response.json()])
+
+
+class AdminQueryCountTest(QueryCountTestCase):
+    def setUp(self):
+        admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+
+    def assertChangelistQueryCountDoesNotGrow(self, model_name):
+        url = f'/admin/foodcartapp/{model_name}/'
+        self.assertQueryCountDoesNotGrow(lambda size: self.client.get(url), max_queries=10)
+
+    def test_order_changelist(self):
+        self.assertChangelistQueryCountDoesNotGrow('order')
+
+    def test_restaurant_changelist(self):
+        self.assertChangelistQueryCountDoesNotGrow('restaurant')
+
+    def test_product_changelist(self):
+        self.assertChangelistQueryCountDoesNotGrow('product')
+
+    def test_place_changelist(self):
+        self.assertChangelistQueryCountDoesNotGrow('place')
+
+
+class ExportOrdersTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        product = Product.objects.create(name='Бургер', price=100, image='burger.jpg')
+        for day in range(1, 6):
+            order = Order.objects.create(
+                firstname='Иван', lastname='Петров', phonenumber='+79001234567', address='Москва', pay=Order.CASH,
+            )
+            OrderItem.objects.create(order=order, product=product, quantity=day, price=100 * day)
+            Order.objects.filter(id=order.id).update(registration_date=datetime(2024, 1, day, 12, tzinfo=timezone.utc))
+        Order.objects.create(firstname='Пётр', lastname='Без позиций', phonenumber='+79001234567', address='Москва')
+
+    def test_csv_has_row_per_item(self):
+        rows = list(csv.reader(export_orders('csv')))
+
+        self.assertEqual(rows[0][:2], ['id', 'registration_date'])
+        self.assertEqual(len(rows), 1 + 5 + 1)
+
+    def test_jsonl_filters_by_registration_date(self):
+        lines = export_orders('jsonl', date_from=date(2024, 1, 2), date_to=date(2024, 1, 4), chunk_size=2)
+        orders = [json.loads(line) for line in lines]
+
+        self.assertEqual([order['items'][0]['quantity'] for order in orders], [2, 3, 4])
+        self.assertEqual(orders[0]['items'][0]['product_name'], 'Бургер')
+
+
+class MenuImportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurants = [Restaurant.objects.create(name=f'Ресторан {number}') for number in range(10)]
+        cls.products = [
+            Product.objects.create(name=f'Бургер {number}', price=100, image='burger.jpg')
+            for number in range(10)
+        ]
+        RestaurantMenuItem.objects.create(restaurant=cls.restaurants[0], product=cls.products[0], availability=True)
+        RestaurantMenuItem.objects.create(restaurant=cls.restaurants[0], product=cls.products[1], availability=True)
+
+    def test_applies_difference(self):
+        restaurant, product = self.restaurants[0], self.products
+        stats = import_menu_availability({
+            (restaurant.id, product[0].id): False,
+            (restaurant.id, product[1].id): True,
+            (restaurant.id, product[2].id): True,
+            (restaurant.id, 0): True,
+        })
+
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(stats['updated'], 1)
+        self.assertEqual(stats['unchanged'], 1)
+        self.assertEqual(stats['unknown_products'], [0])
+        self.assertFalse(RestaurantMenuItem.objects.get(restaurant=restaurant, product=product[0]).availability)
+        self.assertTrue(RestaurantMenuItem.objects.filter(restaurant=restaurant, product=product[2]).exists())
+
+    def test_query_count_does_not_depend_on_rows_count(self):
+        availability = {
+            (restaurant.id, product.id): True
+            for restaurant in self.restaurants
+            for product in self.products
+        }
+        with self.assertNumQueries(6):
+            stats = import_menu_availability(availability)
+        self.assertEqual(stats['created'] + stats['unchanged'], 100)
+
+
+class DispatchTest(TestCase):
+    def test_plan_prefers_nearest_restaurant_within_capacity(self):
+        assignments = plan_dispatch(
+            {1: [(10, 1.0), (20, 5.0)], 2: [(10, 2.0), (20, 3.0)], 3: [(10, 1.5)]},
+            loads={},
+            capacity=2,
+            load_penalty_km=0,
+        )
+
+        self.assertEqual(assignments, {1: 10, 3: 10, 2: 20})
+
+    def test_plan_penalizes_loaded_restaurants(self):
+        assignments = plan_dispatch({1: [(10, 1.0), (20, 2.0)]}, loads={10: 3}, capacity=10, load_penalty_km=0.5)
+
+        self.assertEqual(assignments, {1: 20})
+
+    @override_settings(DISPATCH_RESTAURANT_CAPACITY=1, DISPATCH_LOAD_PENALTY_KM=0)
+    def test_dispatch_orders_in_one_update(self):
+        restaurants = [Restaurant.objects.create(name=f'Ресторан {number}') for number in range(2)]
+        orders = [
+            Order.objects.create(firstname='Иван', lastname='Петров', phonenumber='+79001234567', address='Москва')
+            for _ in range(3)
+        ]
+        for order in orders:
+            OrderCandidate.objects.create(order=order, restaurant=restaurants[0], distance_km=1)
+            OrderCandidate.objects.create(order=order, restaurant=restaurants[1], distance_km=2)
+
+        with CaptureQueriesContext(connection) as queries:
+            assignments = dispatch_orders()
+
+        self.assertEqual(sorted(assignments.values()), [restaurant.id for restaurant in restaurants])
+        self.assertEqual(Order.objects.filter(restaurant__isnull=True).count(), 1)
+        updates = [query for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+
+
+class RestaurantLoadTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurants = [Restaurant.objects.create(name=f'Ресторан {number}') for number in range(2)]
+
+    def create_order(self, **fields):
+        return Order.objects.create(
+            firstname='Иван', lastname='Петров', phonenumber='+79001234567', address='Москва', **fields,
+        )
+
+    def test_counter_follows_status_and_restaurant(self):
+        first, second = self.restaurants
+        order = self.create_order(restaurant=first)
+        self.assertEqual(get_in_flight_orders().get(first.id, 0), 0)
+
+        order.status = Order.COOKING
+        order.save()
+        self.assertEqual(get_in_flight_orders()[first.id], 1)
+
+        order.restaurant = second
+        order.status = Order.DELIVERY
+        order.save()
+        self.assertEqual(get_in_flight_orders(), {first.id: 0, second.id: 1})
+
+        Order.objects.get(id=order.id).delete()
+        self.assertEqual(get_in_flight_orders(), {first.id: 0, second.id: 0})
+
+    def test_status_change_updates_order_and_counter(self):
+        order = self.create_order(restaurant=self.restaurants[0], status=Order.COOKING)
+        order = Order.objects.get(id=order.id)
+        order.status = Order.READY
+
+        with CaptureQueriesContext(connection) as queries:
+            order.save(update_fields=['status'])
+
+        updates = [query for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 2)  # заказ и счётчик
+        self.assertEqual(get_in_flight_orders()[self.restaurants[0].id], 0)
+
+    def test_stale_copies_do_not_count_twice(self):
+        order = self.create_order(restaurant=self.restaurants[0])
+        manager_copy = Order.objects.get(id=order.id)
+        admin_copy = Order.objects.get(id=order.id)
+        for copy in (manager_copy, admin_copy):
+            copy.status = Order.COOKING
+            copy.save()
+
+        self.assertEqual(get_in_flight_orders()[self.restaurants[0].id], 1)
+
+    def test_reconcile_fixes_drift(self):
+        order = self.create_order(restaurant=self.restaurants[0])
+        Order.objects.filter(id=order.id).update(status=Order.COOKING)  # без сигналов
+
+        drift = reconcile_restaurant_loads()
+
+        self.assertEqual(drift, {self.restaurants[0].id: (None, 1)})
+        self.assertEqual(get_in_flight_orders()[self.restaurants[0].id], 1)
+        self.assertEqual(reconcile_restaurant_loads(), {})
+        self.assertEqual(count_in_flight_orders(), {self.restaurants[0].id: 1})
+
+
+class OrderSummaryTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = [Product.objects.create(name=f'Бургер {number}', price=100) for number in range(3)]
+        cls.order = Order.objects.create(
+            firstname='Иван', lastname='Петров', phonenumber='+79001234567', address='Москва',
+        )
+
+    def add_item(self, product):
+        return OrderItem.objects.create(order=self.order, product=product, quantity=1, price=product.price)
+
+    def test_summary_follows_items(self):
+        first, second, third = self.products
+        self.add_item(third)
+        item = self.add_item(first)
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.items_count, self.order.product_ids), (2, f'{first.id},{third.id}'))
+
+        item.delete()
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.items_count, self.order.product_ids), (1, str(third.id)))
+
+    def test_deferred_summary_is_counted_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            with defer_order_summaries():
+                for product in self.products:
+                    self.add_item(product)
+
+        summary_updates = [
+            query for query in queries
+            if query['sql'].startswith('UPDATE') and 'items_count' in query['sql']
+        ]
+        self.assertEqual(len(summary_updates), 1)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.items_count, 3)
+
+    def test_check_fixes_drift(self):
+        self.add_item(self.products[0])
+        Order.objects.filter(id=self.order.id).update(items_count=0, product_ids='')  # без сигналов
+
+        self.assertEqual(len(check_order_summaries()), 1)
+        drift = check_order_summaries(fix=True)
+
+        self.assertEqual(drift, {self.order.id: ((0, ''), (1, str(self.products[0].id)))})
+        self.assertEqual(check_order_summaries(), {})
+
+
+class ArchiveOrdersTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = Product.objects.create(name='Бургер', price=100, image='burger.jpg')
+        cls.orders = {}
+        for status in [Order.READY, Order.DELIVERY]:
+            for year in [2024, 2099]:
+                order = Order.objects.create(
+                    firstname='Иван', lastname='Петров', phonenumber='+79001234567', address='Москва', status=status,
+                )
+                OrderItem.objects.create(order=order, product=cls.product, quantity=2, price=200)
+                Order.objects.filter(id=order.id).update(registration_date=datetime(year, 1, 1, tzinfo=timezone.utc))
+                cls.orders[status, year] = order
+
+    def test_moves_only_old_delivered_orders(self):
+        old_order = self.orders[Order.READY, 2024]
+
+        self.assertEqual(archive_orders(30, dry_run=True), 1)
+        self.assertEqual(archive_orders(30, batch_size=1), 1)
+
+        self.assertFalse(Order.objects.filter(id=old_order.id).exists())
+        self.assertEqual(Order.objects.count(), 3)
+        archived_order = ArchivedOrder.objects.get()
+        self.assertEqual(archived_order.id, old_order.id)
+        self.assertEqual(archived_order.registration_date, datetime(2024, 1, 1, tzinfo=timezone.utc))
+        self.assertEqual(list(ArchivedOrderItem.objects.values_list('product', 'quantity')), [(self.product.id, 2)])
+        self.assertEqual(archive_orders(30), 0)
+
+    def test_archive_deletes_skip_per_order_handlers(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            archive_orders(30)
+
+        self.assertEqual(callbacks, [])
+        self.assertEqual(ArchivedOrder.objects.get().items_count, 1)
+
+    def test_archived_orders_are_exported_and_read_only(self):
+        archive_orders(30)
+        archived_id = self.orders[Order.READY, 2024].id
+
+        archived = [json.loads(line) for line in export_orders('jsonl', source='archived')]
+        self.assertEqual([(order['id'], len(order['items'])) for order in archived], [(archived_id, 1)])
+        # текущий заказ старше архивного: выгрузка всё равно идёт по дате регистрации
+        current_order = self.orders[Order.DELIVERY, 2024]
+        Order.objects.filter(id=current_order.id).update(registration_date=datetime(2020, 1, 1, tzinfo=timezone.utc))
+        all_orders = [json.loads(line) for line in export_orders('jsonl', source='all')]
+        registration_dates = [order['registration_date'] for order in all_orders]
+        self.assertEqual(len(all_orders), 4)
+        self.assertEqual(registration_dates, sorted(registration_dates))
+
+        admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        url = f'/admin/foodcartapp/archivedorder/{archived_id}/change/'
+        self.assertContains(self.client.get(url), 'Петров')
+        self.assertEqual(self.client.get('/admin/foodcartapp/archivedorder/add/').status_code, 403)
+
+
+class AsyncRegisterOrderCsrfTest(TestCase):
+    def post_order(self, user):
+        request = RequestFactory().post('/api/order/', data='{}', content_type='application/json')
+        request.user = user
+        return async_to_sync(async_views.register_order)(request)
+
+    def test_session_user_needs_csrf_token(self):
+        user = get_user_model().objects.create_user('manager')
+        self.assertEqual(self.post_order(user).status_code, 403)
+
+    def test_anonymous_client_does_not(self):
+        self.assertEqual(self.post_order(AnonymousUser()).status_code, 400)
+
+
+class MetricsViewTest(TestCase):
+    def test_closed_without_token(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_requires_bearer_token(self):
+        self.assertEqual(self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        response = self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertContains(response, 'http_request_duration_seconds')
+
+
+class RestaurantCandidatesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurant = Restaurant.objects.create(name='Ресторан')
+
+    def test_rename_does_not_rebuild_candidates(self):
+        restaurant = Restaurant.objects.get(id=self.restaurant.id)
+        restaurant.name = 'Новое название'
+        with self.captureOnCommitCallbacks() as callbacks:
+            restaurant.save()
+
+        self.assertNotIn(rebuild_order_candidates, callbacks)
+
+    def test_delete_recomputes_affected_orders(self):
+        order = Order.objects.create(firstname='Иван', lastname='Петров', phonenumber='+79001234567', address='Москва')
+        OrderCandidate.objects.create(order=order, restaurant=self.restaurant)
+        other_restaurant = Restaurant.objects.create(name='Другой')
+        RestaurantMenuItem.objects.create(restaurant=other_restaurant, product=Product.objects.create(name='Бургер', price=1))
+        OrderItem.objects.create(order=order, product=Product.objects.get(), quantity=1, price=1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.restaurant.delete()
+
+        self.assertEqual(list(OrderCandidate.objects.values_list('order', 'restaurant')), [(order.id, other_restaurant.id)])
+
+    def test_menu_items_in_one_block_scan_open_orders_once(self):
+        products = [Product.objects.create(name=f'Бургер {number}', price=1) for number in range(3)]
+
+        with mock.patch('foodcartapp.candidates.update_candidates_for_products') as update_candidates:
+            with self.captureOnCommitCallbacks(execute=True), defer_candidate_updates():
+                for product in products:
+                    RestaurantMenuItem.objects.create(restaurant=self.restaurant, product=product)
+
+        update_candidates.assert_called_once()
+        self.assertEqual(sorted(update_candidates.call_args.args[0]), [product.id for product in products])
+
+
+class DistancesTest(SimpleTestCase):
+    origins = [(55.75, 37.62), (59.94, 30.31), (-33.87, 151.21)]
+    destinations = [(55.76, 37.64), (55.7, 37.5), (56.84, 60.6), (40.71, -74.0)]
+
+    def test_matrix_matches_geopy(self):
+        matrix = get_distance_matrix(self.origins, self.destinations)
+
+        self.assertEqual(matrix.shape, (3, 4))
+        for row, origin in enumerate(self.origins):
+            for column, destination in enumerate(self.destinations):
+                geodesic_km = geopy_distance.distance(origin, destination).km
+                # сфера против эллипсоида: расхождение не больше 0.5%
+                self.assertAlmostEqual(matrix[row, column], geodesic_km, delta=geodesic_km * 0.005 + 0.01)
+
+    def test_refine_nearest(self):
+        matrix = get_distance_matrix(self.origins, self.destinations)
+        nearest, distances = refine_nearest(self.origins, self.destinations, matrix, 2)
+
+        self.assertEqual(nearest.tolist()[0], [0, 1])
+        self.assertAlmostEqual(distances[0, 0], geopy_distance.distance(self.origins[0], self.destinations[0]).km)
+        self.assertTrue(np.all(np.diff(distances, axis=1) >= 0))
+
+    def test_refine_nearest_with_no_neighbours(self):
+        matrix = get_distance_matrix(self.origins, self.destinations)
+        nearest, distances = refine_nearest(self.origins, self.destinations, matrix, 0)
+
+        self.assertEqual(nearest.shape, (3, 0))
+        self.assertEqual(distances.shape, (3, 0))
+
+    def test_refine_nearest_with_k_above_columns(self):
+        matrix = get_distance_matrix(self.origins, self.destinations)
+        nearest, distances = refine_nearest(self.origins, self.destinations, matrix, 10)
+
+        self.assertEqual(nearest.shape, (3, 4))
+        self.assertEqual(sorted(nearest.tolist()[1]), [0, 1, 2, 3])
+        self.assertTrue(np.all(np.diff(distances, axis=1) >= 0))
+
+
+class RestaurantIndexTest(SimpleTestCase):
+    @staticmethod
+    def haversine_km(start, end):
+        start_lat, start_lon, end_lat, end_lon = map(math.radians, [*start, *end])
+        haversine = (
+            math.sin((end_lat - start_lat) / 2) ** 2
+            + math.cos(start_lat) * math.cos(end_lat) * math.sin((end_lon - start_lon) / 2) ** 2
+        )
+        return 2 * 6371.0088 * math.asin(math.sqrt(haversine))
+
+    def setUp(self):
+        randomizer = random.Random(5)
+        self.index = RestaurantIndex(cell_size=0.05)
+        self.coordinates = {}
+        for restaurant_id in range(1, 301):
+            coordinates = None
+            if restaurant_id % 10:
+                coordinates = (55.75 + randomizer.uniform(-0.5, 0.5), 37.6 + randomizer.uniform(-0.8, 0.8))
+                self.coordinates[restaurant_id] = coordinates
+            self.index.set_restaurant(restaurant_id, coordinates)
+        # бургер есть везде, картошка — в каждом третьем ресторане, пирог — в двух, один из них без координат
+        self.index.restaurants_by_product = {
+            'burger': set(range(1, 301)),
+            'fries': set(range(3, 301, 3)),
+            'pie': {10, 77},
+        }
+
+    def brute_force_nearest(self, coordinates, product_ids, k):
+        capable_ids = set.intersection(*(self.index.restaurants_by_product[product_id] for product_id in product_ids))
+        distances = sorted(
+            (self.haversine_km(coordinates, self.coordinates[restaurant_id]), restaurant_id)
+            for restaurant_id in capable_ids
+            if restaurant_id in self.coordinates
+        )
+        return [(restaurant_id, distance_km) for distance_km, restaurant_id in distances[:k]]
+
+    def assertNearest(self, coordinates, product_ids, k):
+        nearest = self.index.nearest(coordinates, product_ids, k)
+        expected = self.brute_force_nearest(coordinates, product_ids, k)
+
+        self.assertEqual([restaurant_id for restaurant_id, distance_km in nearest], [
+            restaurant_id for restaurant_id, distance_km in expected
+        ])
+        for (restaurant_id, distance_km), (expected_id, expected_km) in zip(nearest, expected):
+            self.assertAlmostEqual(distance_km, expected_km, places=6)
+        return nearest
+
+    def test_matches_brute_force(self):
+        # центр, окраина сетки и точка далеко за её пределами
+        for coordinates in [(55.75, 37.6), (55.3, 38.35), (59.9, 30.3)]:
+            for product_ids in [['burger'], ['burger', 'fries']]:
+                for k in [1, 5, 20]:
+                    with self.subTest(coordinates=coordinates, product_ids=product_ids, k=k):
+                        self.assertEqual(len(self.assertNearest(coordinates, product_ids, k)), k)
+
+    def test_k_larger_than_matches(self):
+        nearest = self.assertNearest((55.75, 37.6), ['pie'], 5)
+
+        self.assertEqual([restaurant_id for restaurant_id, distance_km in nearest], [77])
+
+    def test_restaurants_without_coordinates(self):
+        self.assertIn(10, self.index.get_capable(['pie']))
+        nearest = self.index.nearest((55.75, 37.6), ['burger'], 300)
+
+        self.assertNotIn(10, [restaurant_id for restaurant_id, distance_km in nearest])
+        self.assertEqual(len(nearest), len(self.coordinates))
+        self.assertEqual(self.index.nearest((55.75, 37.6), ['burger'], 0), [])
+
+
+class WarmGeocacheTest(TestCase):
+    @staticmethod
+    def geocode_except(failed_address):
+        def geocode_places(api_key, addresses):
+            return [Place(name=address, lon=1, lat=2) for address in addresses if address != failed_address]
+        return geocode_places
+
+    def test_failed_addresses_are_retried_after_restart(self):
+        for address in ['Москва, 1', 'Москва, 2', 'Москва, 3']:
+            Restaurant.objects.create(name=address, address=address)
+        with tempfile.TemporaryDirectory() as directory:
+            progress_file = os.path.join(directory, 'progress.json')
+            command = 'foodcartapp.management.commands.warm_geocache.geocode_places'
+            with mock.patch(command, self.geocode_except('Москва, 2')):
+                call_command('warm_geocache', chunk_size=2, progress_file=progress_file, stdout=io.StringIO())
+            self.assertFalse(Place.objects.filter(name='Москва, 2').exists())
+
+            with mock.patch(command, self.geocode_except(None)):
+                call_command('warm_geocache', chunk_size=2, progress_file=progress_file, stdout=io.StringIO())
+
+        self.assertEqual(Place.objects.count(), 3)
+
+
+class RegisterOrdersBatchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = [Product.objects.create(name=f'Бургер {number}', price=100) for number in range(3)]
+
+    def get_order_data(self, number, products=None):
+        return {
+            'products': [{'product': product.id, 'quantity': 2} for product in products or self.products],
+            'firstname': 'Иван',
+            'lastname': f'Покупатель {number}',
+            'phonenumber': '+79001234567',
+            'address': 'Москва, Тверская 1',
+        }
+
+    def post_batch(self, orders_data):
+        return self.client.post('/api/orders/batch/', orders_data, content_type='application/json')
+
+    def test_creates_orders_with_items(self):
+        response = self.post_batch([self.get_order_data(number) for number in range(2)])
+
+        self.assertEqual(response.status_code, 201)
+        order_ids = [result['id'] for result in response.json()]
+        self.assertEqual(list(Order.objects.order_by('id').values_list('id', flat=True)), order_ids)
+        self.assertEqual(OrderItem.objects.filter(order__in=order_ids).count(), 6)
+        self.assertEqual(Order.objects.get(id=order_ids[0]).total_price, Decimal(600))
+
+    def test_reports_errors_per_order(self):
+        invalid_order = self.get_order_data(1)
+        invalid_order['products'] = [{'product': 999999, 'quantity': 1}]
+
+        response = self.post_batch([self.get_order_data(0), invalid_order])
+
+        self.assertEqual(response.status_code, 207)
+        valid_result, invalid_result = response.json()
+        self.assertEqual(valid_result['index'], 0)
+        self.assertTrue(Order.objects.filter(id=valid_result['id']).exists())
+        self.assertEqual(invalid_result['index'], 1)
+        self.assertIn('products', invalid_result['errors'])
+        self.assertEqual(Order.objects.count(), 1)
+
+    @override_settings(ORDERS_BATCH_MAX_SIZE=2)
+    def test_rejects_too_large_batch(self):
+        response = self.post_batch([self.get_order_data(number) for number in range(3)])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        with CaptureQueriesContext(connection) as small_batch_queries:
+            self.post_batch([self.get_order_data(0)])
+        with CaptureQueriesContext(connection) as large_batch_queries:
+            self.post_batch([self.get_order_data(number) for number in range(10)])
+
+        if connection.features.can_return_rows_from_bulk_insert:
+            self.assertEqual(len(small_batch_queries), len(large_batch_queries))
+        else:
+            # без RETURNING заказы вставляются по одному, остальное не растёт
+            self.assertEqual(len(large_batch_queries) - len(small_batch_queries), 9)
+
+
+class GeocoderClientTest(SimpleTestCase):
+    def test_retries_server_errors(self):
+        client = GeocoderClient('key', 'http://geocoder.invalid/1.x', retries=2, backoff=0)
+        found = mock.Mock(status_code=200)
+        found.json.return_value = {'response': {'GeoObjectCollection': {'featureMember': [
+            {'GeoObject': {'Point': {'pos': '37.6 55.7'}}},
+        ]}}}
+        responses = [mock.Mock(status_code=503), mock.Mock(status_code=500), found]
+
+        with mock.patch.object(client.session, 'get', side_effect=responses) as get:
+            self.assertEqual(client.fetch_coordinates('Москва'), ('55.7', '37.6'))
+        self.assertEqual(get.call_count, 3)
+
+    def test_gives_up_after_retries(self):
+        with GeocoderStub(failing_addresses=['Москва']) as stub:
+            client = GeocoderClient('key', stub.url, retries=2, backoff=0)
+            with self.assertRaises(requests.HTTPError):
+                client.fetch_coordinates('Москва')
+            self.assertEqual(stub.requests_count, 3)
+
+    def test_rate_limit(self):
+        bucket = TokenBucket(rate=50, capacity=1)
+        started_at = time.monotonic()
+        for _ in range(6):
+            bucket.acquire()
+
+        self.assertGreaterEqual(time.monotonic() - started_at, 5 / 50 * 0.9)
+
+    def test_fetch_many_skips_failed_addresses(self):
+        with GeocoderStub(unknown_addresses=['Нигде'], failing_addresses=['Сбой']) as stub:
+            client = GeocoderClient('key', stub.url, retries=0, backoff=0, rate_limit=1000)
+            coordinates = client.fetch_many(['Москва', 'Нигде', 'Сбой'])
+
+        lon, lat = get_stub_coordinates('Москва')
+        self.assertEqual(coordinates, {'Москва': (str(lat), str(lon)), 'Нигде': None})
+
+
+class TTLCacheTest(SimpleTestCase):
+    def test_evicts_least_recently_used(self):
+        places = TTLCache(maxsize=2, ttl=60)
+        places.set('Москва', (55.7, 37.6))
+        places.set('Тверь', (56.8, 35.9))
+        places.get('Москва')
+        places.set('Казань', (55.8, 49.1))
+
+        self.assertEqual(places.get('Москва'), (55.7, 37.6))
+        self.assertIs(places.get('Тверь'), TTLCache.missing)
+        self.assertEqual(places.get('Казань'), (55.8, 49.1))
+
+    def test_expires_after_ttl(self):
+        places = TTLCache(maxsize=2, ttl=60)
+        with mock.patch('foodcartapp.geocoding.time.monotonic', return_value=1000):
+            places.set('Москва', None)
+        with mock.patch('foodcartapp.geocoding.time.monotonic', return_value=1059):
+            self.assertIsNone(places.get('Москва'))
+        with mock.patch('foodcartapp.geocoding.time.monotonic', return_value=1061):
+            self.assertIs(places.get('Москва'), TTLCache.missing)
+
+
+class GetPlacesTest(TestCase):
+    def setUp(self):
+        places_cache.clear()
+        self.addCleanup(places_cache.clear)
+        self.stub = GeocoderStub(unknown_addresses=['Нигде'], failing_addresses=['Сбой'])
+        self.stub.__enter__()
+        self.addCleanup(self.stub.__exit__, None, None, None)
+        settings_override = override_settings(
+            GEOCODER_URL=self.stub.url, GEOCODER_RETRIES=0, GEOCODER_BACKOFF=0, GEOCODER_RATE_LIMIT=1000,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_saves_new_places_in_one_bulk_create(self):
+        with mock.patch.object(Place.objects, 'bulk_create', wraps=Place.objects.bulk_create) as bulk_create:
+            places = get_places('key', ['Москва', 'Тверь', 'Нигде', 'Сбой'])
+
+        bulk_create.assert_called_once()
+        self.assertEqual(set(places), {'Москва', 'Тверь', 'Нигде'})
+        lon, lat = get_stub_coordinates('Москва')
+        self.assertEqual(places['Москва'].coordinates, (lat, lon))
+
+    def test_unknown_address_is_cached_as_empty_place(self):
+        self.assertEqual(get_places_coordinates('key', ['Нигде']), {'Нигде': None})
+        place = Place.objects.get(name='Нигде')
+        self.assertIsNone(place.lat)
+        self.assertIsNone(place.lon)
+
+        requests_count = self.stub.requests_count
+        places_cache.clear()
+        self.assertEqual(get_places_coordinates('key', ['Нигде']), {'Нигде': None})
+        self.assertEqual(self.stub.requests_count, requests_count)
+
+    def test_network_failure_is_not_cached(self):
+        self.assertEqual(get_places_coordinates('key', ['Сбой']), {'Сбой': None})
+        self.assertFalse(Place.objects.filter(name='Сбой').exists())
+
+        requests_count = self.stub.requests_count
+        get_places_coordinates('key', ['Сбой'])
+        self.assertEqual(self.stub.requests_count, requests_count + 1)
+
+    def test_process_cache_spares_database(self):
+        get_places_coordinates('key', ['Москва'])
+        with self.assertNumQueries(0):
+            coordinates = get_places_coordinates('key', ['Москва'])
+
+        lon, lat = get_stub_coordinates('Москва')
+        self.assertEqual(coordinates, {'Москва': (lat, lon)})
+
+
+class SharedCacheCheckTest(SimpleTestCase):
+    @override_settings(DEBUG=False, CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_process_local_cache_in_production(self):
+        self.assertEqual([error.id for error in check_shared_cache(None)], ['foodcartapp.E001'])
+
+    @override_settings(DEBUG=False, CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'star_burger_cache',
+    }})
+    def test_shared_cache(self):
+        self.assertEqual(check_shared_cache(None), [])
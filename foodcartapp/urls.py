@@ -1,12 +1,16 @@
+from django.conf import settings
 from django.urls import path
 
-from .views import product_list_api, banners_list_api, register_order
+from . import async_views, views
 
 
 app_name = "foodcartapp"
 
+api_views = async_views if settings.ASYNC_API else views
+
 urlpatterns = [
-    path('products/', product_list_api),
-    path('banners/', banners_list_api),
-    path('order/', register_order),
+    path('products/', api_views.product_list_api),
+    path('banners/', api_views.banners_list_api),
+    path('order/', api_views.register_order),
+    path('orders/batch/', views.register_orders_batch),
 ]
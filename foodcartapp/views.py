@@ -1,70 +1,29 @@
-from django.http import JsonResponse
-from django.templatetags.static import static
+from django.conf import settings
 
-from .models import Product, OrderItem, Order
+from .models import OrderItem, Order
 from django.shortcuts import get_object_or_404
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
 from rest_framework import status
 
-from .serializer import OrderSerializer
+from .payloads import banners, product_catalog
+from .serializer import OrderListSerializer, OrderSerializer
 
 
 def banners_list_api(request):
-    # FIXME move data to db?
-    return JsonResponse([
-        {
-            'title': 'Burger',
-            'src': static('burger.jpg'),
-            'text': 'Tasty Burger at your door step',
-        },
-        {
-            'title': 'Spices',
-            'src': static('food.jpg'),
-            'text': 'All Cuisines',
-        },
-        {
-            'title': 'New York',
-            'src': static('tasty.jpg'),
-            'text': 'Food is incomplete without a tasty dessert',
-        }
-    ], safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+    return banners.get_response(request)
 
 
 def product_list_api(request):
-    products = Product.objects.select_related('category').available()
-
-    dumped_products = []
-    for product in products:
-        dumped_product = {
-            'id': product.id,
-            'name': product.name,
-            'price': product.price,
-            'special_status': product.special_status,
-            'description': product.description,
-            'category': {
-                'id': product.category.id,
-                'name': product.category.name,
-            } if product.category else None,
-            'image': product.image.url,
-            'restaurant': {
-                'id': product.id,
-                'name': product.name,
-            }
-        }
-        dumped_products.append(dumped_product)
-    return JsonResponse(dumped_products, safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+    return product_catalog.get_response(request)
 
 
 @api_view(['POST'])
 def register_order(request):
-    serializer = OrderSerializer(data=request.data)
+    serializer = OrderSerializer(
+        data=request.data,
+        context={'products': OrderListSerializer.prefetch_products([request.data])},
+    )
     serializer.is_valid(raise_exception=True)
     order = serializer.create(serializer.validated_data)
     serializer = OrderSerializer(order)
@@ -72,3 +31,32 @@ def register_order(request):
     return Response(serializer.data)
 
 
+@api_view(['POST'])
+def register_orders_batch(request):
+    orders_data = request.data
+    if not isinstance(orders_data, list):
+        return Response({'error': 'Ожидается список заказов'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(orders_data) > settings.ORDERS_BATCH_MAX_SIZE:
+        return Response(
+            {'error': f'Не больше {settings.ORDERS_BATCH_MAX_SIZE} заказов за запрос'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    serializer = OrderSerializer(
+        data=orders_data,
+        many=True,
+        context={'products': OrderListSerializer.prefetch_products(orders_data)},
+    )
+    validation_results = serializer.validate_each()
+    valid_orders = [validated_data for validated_data, errors in validation_results if errors is None]
+    created_orders = iter(serializer.create(valid_orders))
+
+    results = []
+    for index, (validated_data, errors) in enumerate(validation_results):
+        if errors is None:
+            results.append({'index': index, 'id': next(created_orders).id})
+        else:
+            results.append({'index': index, 'errors': errors})
+
+    response_status = status.HTTP_201_CREATED if len(valid_orders) == len(results) else status.HTTP_207_MULTI_STATUS
+    return Response(results, status=response_status)
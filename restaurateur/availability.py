@@ -0,0 +1,82 @@
+import uuid
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from foodcartapp.models import Product, Restaurant, RestaurantMenuItem
+
+MATRIX_VERSION_CACHE_KEY = 'availability_matrix:version'
+
+
+class AvailabilityMatrix:
+    """
+    Доступность продуктов в ресторанах: строки — продукты, столбцы — рестораны
+    в порядке названий, значения хранятся в булевом массиве numpy
+    """
+
+    def __init__(self, restaurants, products, available):
+        self.restaurants = restaurants
+        self.products = products
+        self.available = available
+
+    @classmethod
+    def build(cls):
+        restaurants = [
+            {'id': restaurant_id, 'name': name}
+            for restaurant_id, name in Restaurant.objects.order_by('name').values_list('id', 'name')
+        ]
+        image_storage = Product._meta.get_field('image').storage
+        products = [
+            {
+                'id': product_id,
+                'name': name,
+                'category': category,
+                'price': price,
+                'image_url': image_storage.url(image) if image else '',
+            }
+            for product_id, name, category, price, image in Product.objects.order_by('id').values_list(
+                'id', 'name', 'category__name', 'price', 'image',
+            )
+        ]
+        restaurant_columns = {restaurant['id']: column for column, restaurant in enumerate(restaurants)}
+        product_rows = {product['id']: row for row, product in enumerate(products)}
+
+        available = np.zeros((len(products), len(restaurants)), dtype=bool)
+        menu_items = RestaurantMenuItem.objects.filter(availability=True).values_list('product_id', 'restaurant_id')
+        for product_id, restaurant_id in menu_items:
+            # продукт или ресторан мог появиться между запросами, он попадёт в следующую версию
+            row = product_rows.get(product_id)
+            column = restaurant_columns.get(restaurant_id)
+            if row is not None and column is not None:
+                available[row, column] = True
+        return cls(restaurants, products, available)
+
+    def rows(self):
+        """
+        :return: пары (продукт, список доступности по ресторанам)
+        """
+        return zip(self.products, self.available.tolist())
+
+
+def get_matrix_version():
+    return cache.get(MATRIX_VERSION_CACHE_KEY) or invalidate_availability_matrix()
+
+
+def invalidate_availability_matrix():
+    version = uuid.uuid4().hex
+    cache.set(MATRIX_VERSION_CACHE_KEY, version, timeout=None)
+    return version
+
+
+def get_availability_matrix(version):
+    """
+    Матрица из кэша для этой версии или собранная заново. Матрица и таблица
+    на её основе живут в кэше не дольше CACHE_ENTRY_TIMEOUT секунд.
+    """
+    matrix_key = f'availability_matrix:{version}'
+    matrix = cache.get(matrix_key)
+    if matrix is None:
+        matrix = AvailabilityMatrix.build()
+        cache.set(matrix_key, matrix, timeout=settings.CACHE_ENTRY_TIMEOUT)
+    return matrix
@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+
+from foodcartapp.models import Order
+from .models import OrderEvent
+
+
+def publish_order_events(order_ids):
+    """
+    Отмечает изменение заказов, включая удаление, и удаляет отметки
+    старше ORDER_EVENTS_RETENTION секунд
+    """
+    OrderEvent.objects.bulk_create(OrderEvent(order_id=order_id) for order_id in order_ids)
+    border = timezone.now() - timedelta(seconds=settings.ORDER_EVENTS_RETENTION)
+    OrderEvent.objects.filter(created_at__lt=border).delete()
+
+
+def get_last_event_id():
+    return OrderEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def get_order_changes(last_event_id):
+    """
+    Собирает заказы, изменённые после события last_event_id.
+    Если это событие уже удалено как устаревшее или изменений больше
+    ORDER_EVENTS_POLL_LIMIT, страницу проще перезагрузить целиком.
+    :return: словарь для ответа опроса страницы заказов: id последнего события, флаг reload,
+        строки изменённых заказов и id удалённых
+    """
+    limit = settings.ORDER_EVENTS_POLL_LIMIT
+    events = list(
+        OrderEvent.objects.filter(id__gte=last_event_id).order_by('id').values_list('id', 'order_id')[:limit + 2]
+    )
+    if last_event_id:
+        if not events or events[0][0] != last_event_id:
+            return {'last_id': get_last_event_id(), 'reload': True}
+        events = events[1:]
+    if len(events) > limit:
+        return {'last_id': get_last_event_id(), 'reload': True}
+    if not events:
+        return {'last_id': last_event_id, 'reload': False, 'orders': [], 'deleted': []}
+
+    order_ids = {order_id for event_id, order_id in events}
+    orders = Order.objects.filter(id__in=order_ids).prefetch_items()
+    next_url = reverse('restaurateur:view_orders')
+    changed_orders = [
+        {
+            'id': order.id,
+            'status': order.status,
+            'html': render_to_string('order_row.html', {'item': order, 'next_url': next_url}),
+        }
+        for order in orders
+    ]
+    return {
+        'last_id': events[-1][0],
+        'reload': False,
+        'orders': changed_orders,
+        'deleted': sorted(order_ids - {order['id'] for order in changed_orders}),
+    }
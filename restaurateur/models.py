@@ -1,3 +1,18 @@
 from django.db import models
 
-# Create your models here.
+
+class OrderEvent(models.Model):
+    """
+    Отметка об изменении заказа для обновления страницы заказов.
+    id событий — общая для всех воркеров последовательность, по которой
+    страница спрашивает, какие заказы изменились после её загрузки.
+    """
+    order_id = models.PositiveIntegerField('id заказа')
+    created_at = models.DateTimeField('создано', auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = 'изменение заказа'
+        verbose_name_plural = 'изменения заказов'
+
+    def __str__(self):
+        return f'{self.id}: заказ {self.order_id}'
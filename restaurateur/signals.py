@@ -0,0 +1,46 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from foodcartapp.archive import is_archiving
+from foodcartapp.models import Order, Product, ProductCategory, Restaurant, RestaurantMenuItem
+from foodcartapp.signals import menu_imported, orders_created, orders_dispatched
+from restaurateur.availability import invalidate_availability_matrix
+from restaurateur.events import publish_order_events
+
+
+@receiver(post_save, sender=Order)
+def publish_saved_order(sender, instance, **kwargs):
+    transaction.on_commit(lambda: publish_order_events([instance.id]))
+
+
+@receiver(orders_created)
+@receiver(orders_dispatched)
+def publish_bulk_saved_orders(sender, order_ids, **kwargs):
+    transaction.on_commit(lambda: publish_order_events(order_ids))
+
+
+@receiver(post_delete, sender=Order)
+def publish_deleted_order(sender, instance, **kwargs):
+    # доставленных заказов на странице нет, событие на каждый архивируемый заказ не нужно
+    if is_archiving():
+        return
+    order_id = instance.id
+    transaction.on_commit(lambda: publish_order_events([order_id]))
+
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=ProductCategory)
+@receiver(post_save, sender=RestaurantMenuItem)
+@receiver(post_delete, sender=RestaurantMenuItem)
+def invalidate_matrix(sender, **kwargs):
+    transaction.on_commit(invalidate_availability_matrix)
+
+
+@receiver(menu_imported)
+def invalidate_matrix_after_import(sender, **kwargs):
+    invalidate_availability_matrix()
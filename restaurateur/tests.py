@@ -1,3 +1,190 @@
-from django.test import TestCase
+from datetime import datetime, timezone
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from foodcartapp.models import Order, Product, Restaurant, RestaurantMenuItem
+from foodcartapp.testing import QueryCountTestCase
+from .availability import AvailabilityMatrix
+from .events import get_last_event_id
+from .models import OrderEvent
+
+
+class ManagerQueryCountTest(QueryCountTestCase):
+    def setUp(self):
+        manager = get_user_model().objects.create_user('manager', is_staff=True)
+        self.client.force_login(manager)
+
+    def test_view_products(self):
+        self.assertQueryCountDoesNotGrow(lambda size: self.client.get('/manager/products/'), max_queries=6)
+
+    def test_view_orders(self):
+        def populate(size):
+            self.populate(size)
+            # при случайных статусах на маленьких данных страница может оказаться пустой
+            Order.objects.update(status=Order.NEW)
+
+        self.assertQueryCountDoesNotGrow(
+            lambda size: self.client.get('/manager/orders/'),
+            max_queries=8,
+            populate=populate,
+        )
+
+
+class ViewOrdersTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurant = Restaurant.objects.create(name='Ресторан')
+        statuses = [Order.NEW, Order.COOKING, Order.DELIVERY, Order.READY]
+        for number in range(12):
+            order = Order.objects.create(
+                firstname='Иван', lastname='Петров', phonenumber='+79001234567', address='Москва',
+                status=statuses[number % 4],
+                pay=Order.CASH if number % 2 else Order.ELECTRONICALLY,
+            )
+            # у части заказов одного статуса одинаковое время регистрации, порядок решает id
+            Order.objects.filter(id=order.id).update(
+                registration_date=datetime(2024, 1, 1 + number // 8, tzinfo=timezone.utc),
+                restaurant=cls.restaurant if number % 3 == 0 else None,
+            )
+
+    def setUp(self):
+        manager = get_user_model().objects.create_user('manager', is_staff=True)
+        self.client.force_login(manager)
+
+    def get_order_ids(self, **filters):
+        """
+        :return: id заказов со всех страниц, по которым проходит ссылка «Дальше»
+        """
+        order_ids = []
+        response = self.client.get('/manager/orders/', filters)
+        while True:
+            order_ids.extend(order.id for order in response.context['order_items'])
+            next_page_query = response.context['next_page_query']
+            if not next_page_query:
+                return order_ids
+            response = self.client.get(f'/manager/orders/?{next_page_query}')
+
+    @override_settings(MANAGER_ORDERS_PAGE_SIZE=2)
+    def test_pages_neither_skip_nor_repeat_orders(self):
+        expected_ids = list(Order.objects.unprocessed().in_keyset_order().values_list('id', flat=True))
+
+        self.assertEqual(len(expected_ids), 9)
+        self.assertEqual(self.get_order_ids(), expected_ids)
+
+    @override_settings(MANAGER_ORDERS_PAGE_SIZE=2)
+    def test_filters_narrow_orders(self):
+        orders = Order.objects.unprocessed().in_keyset_order()
+        filters = {
+            'status': ({'status': Order.COOKING}, orders.filter(status=Order.COOKING)),
+            'restaurant': ({'restaurant': self.restaurant.id}, orders.filter(restaurant=self.restaurant)),
+            'pay': ({'pay': Order.CASH}, orders.filter(pay=Order.CASH)),
+            'all': ({'status': Order.NEW, 'pay': Order.ELECTRONICALLY}, orders.filter(
+                status=Order.NEW, pay=Order.ELECTRONICALLY,
+            )),
+        }
+        for name, (query, expected_orders) in filters.items():
+            with self.subTest(name):
+                expected_ids = list(expected_orders.values_list('id', flat=True))
+                self.assertTrue(0 < len(expected_ids) < 9)
+                self.assertEqual(self.get_order_ids(**query), expected_ids)
+
+
+class ProductsMatrixCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurant = Restaurant.objects.create(name='Ресторан')
+        cls.product = Product.objects.create(name='Бургер', price=100, image='burger.jpg')
+
+    def setUp(self):
+        cache.clear()
+        manager = get_user_model().objects.create_user('manager', is_staff=True)
+        self.client.force_login(manager)
+
+    def test_cached_table_needs_no_queries(self):
+        self.client.get('/manager/products/')
+        with self.assertNumQueries(2):  # сессия и пользователь
+            response = self.client.get('/manager/products/')
+        self.assertContains(response, 'Бургер')
+
+    def test_menu_change_invalidates_table(self):
+        first_response = self.client.get('/manager/products/')
+        with self.captureOnCommitCallbacks(execute=True):
+            RestaurantMenuItem.objects.create(restaurant=self.restaurant, product=self.product)
+        second_response = self.client.get('/manager/products/')
+
+        self.assertNotContains(first_response, '#icon-available"')
+        self.assertContains(second_response, '#icon-available"')
+
+    def test_build_skips_products_created_between_queries(self):
+        late_product = Product.objects.create(name='Новинка', price=200, image='new.jpg')
+        RestaurantMenuItem.objects.create(restaurant=self.restaurant, product=late_product)
+        RestaurantMenuItem.objects.create(restaurant=self.restaurant, product=self.product)
+        products_before = Product.objects.exclude(id=late_product.id).order_by('id')
+
+        with mock.patch.object(Product.objects, 'order_by', return_value=products_before):
+            matrix = AvailabilityMatrix.build()
+
+        self.assertEqual([(product['name'], available) for product, available in matrix.rows()], [('Бургер', [True])])
+
+
+class OrderChangesTest(TestCase):
+    def setUp(self):
+        manager = get_user_model().objects.create_user('manager', is_staff=True)
+        self.client.force_login(manager)
+
+    def create_order(self, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Order.objects.create(
+                firstname='Иван', lastname='Петров', phonenumber='+79001234567', address='Москва', **fields
+            )
+
+    def get_changes(self, after):
+        return self.client.get('/manager/orders/changes/', {'after': after}).json()
+
+    def test_changes_after_event(self):
+        changed_order = self.create_order()
+        deleted_order_id = self.create_order().id
+        last_event_id = get_last_event_id()
+        with self.captureOnCommitCallbacks(execute=True):
+            changed_order.comment = 'Позвонить заранее'
+            changed_order.save()
+            Order.objects.get(id=deleted_order_id).delete()
+
+        changes = self.get_changes(last_event_id)
+
+        self.assertFalse(changes['reload'])
+        self.assertEqual(changes['last_id'], get_last_event_id())
+        self.assertEqual([order['id'] for order in changes['orders']], [changed_order.id])
+        self.assertIn(f'id="order-{changed_order.id}"', changes['orders'][0]['html'])
+        self.assertEqual(changes['deleted'], [deleted_order_id])
+
+    def test_no_changes(self):
+        self.create_order()
+        last_event_id = get_last_event_id()
+
+        changes = self.get_changes(last_event_id)
+
+        self.assertEqual(changes, {'last_id': last_event_id, 'reload': False, 'orders': [], 'deleted': []})
+
+    def test_pruned_event_requires_reload(self):
+        self.create_order()
+        last_event_id = get_last_event_id()
+        OrderEvent.objects.filter(id=last_event_id).delete()
+        self.create_order()
+
+        self.assertTrue(self.get_changes(last_event_id)['reload'])
+
+    @override_settings(ORDER_EVENTS_POLL_LIMIT=1)
+    def test_too_many_changes_require_reload(self):
+        self.create_order()
+        last_event_id = get_last_event_id()
+        self.create_order()
+        self.create_order()
+
+        changes = self.get_changes(last_event_id)
+
+        self.assertTrue(changes['reload'])
+        self.assertEqual(changes['last_id'], get_last_event_id())
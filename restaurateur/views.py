@@ -1,17 +1,25 @@
 from collections import defaultdict
+from datetime import datetime
 from itertools import chain
 
 from django import forms
+from django.conf import settings
+from django.core import signing
 from django.db.models import Q, Count
+from django.http import HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.shortcuts import redirect, render, get_object_or_404
 from django.views import View
 from django.urls import reverse_lazy, reverse
 from django.contrib.auth.decorators import user_passes_test
 
+from django.utils.functional import SimpleLazyObject
 from django.contrib.auth import authenticate, login
 from django.contrib.auth import views as auth_views
 
-from foodcartapp.models import Product, Restaurant, Order, RestaurantMenuItem
+from foodcartapp.export import EXPORT_FORMATS, ORDER_SOURCES, export_orders
+from foodcartapp.models import Restaurant, Order
+from .availability import get_availability_matrix, get_matrix_version
+from .events import get_last_event_id, get_order_changes
 
 
 class Login(forms.Form):
@@ -31,6 +39,66 @@ class Login(forms.Form):
     )
 
 
+class OrdersFilter(forms.Form):
+    status = forms.ChoiceField(
+        label='Статус', required=False,
+        choices=[('', 'Все')] + [choice for choice in Order.ORDER_STATUS if choice[0] != Order.READY],
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    restaurant = forms.ModelChoiceField(
+        label='Ресторан', required=False, empty_label='Все',
+        queryset=Restaurant.objects.order_by('name'),
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    pay = forms.ChoiceField(
+        label='Способ оплаты', required=False,
+        choices=[('', 'Все')] + Order.PAY_TYPE,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+
+    def filter(self, orders):
+        if self.cleaned_data['status']:
+            orders = orders.filter(status=self.cleaned_data['status'])
+        if self.cleaned_data['restaurant']:
+            orders = orders.filter(restaurant=self.cleaned_data['restaurant'])
+        if self.cleaned_data['pay']:
+            orders = orders.filter(pay=self.cleaned_data['pay'])
+        return orders
+
+
+class OrdersExportForm(forms.Form):
+    date_from = forms.DateField(
+        label='С', required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+    date_to = forms.DateField(
+        label='По', required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+    format = forms.ChoiceField(
+        label='Формат', initial='csv',
+        choices=[(export_format, export_format.upper()) for export_format in EXPORT_FORMATS],
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    source = forms.ChoiceField(
+        label='Заказы', initial='current',
+        choices=list(ORDER_SOURCES.items()),
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+
+
+def dump_orders_cursor(order):
+    return signing.dumps([order.status, order.registration_date.isoformat(), order.id])
+
+
+def load_orders_cursor(cursor):
+    try:
+        status, registration_date, order_id = signing.loads(cursor)
+        return status, datetime.fromisoformat(registration_date), order_id
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+
+
 class LoginView(View):
     def get(self, request, *args, **kwargs):
         form = Login()
@@ -68,35 +136,83 @@ def is_manager(user):
 
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_products(request):
-    restaurants = list(Restaurant.objects.order_by('name'))
-    products = list(Product.objects.prefetch_related('menu_items'))
-    
-    products_with_restaurant_availability = []
-    for product in products:
-        availability = {item.restaurant_id: item.availability for item in product.menu_items.all()}
-        ordered_availability = [availability.get(restaurant.id, False) for restaurant in restaurants]
-
-        products_with_restaurant_availability.append(
-            (product, ordered_availability)
-        )
-
+    # таблица кэшируется целиком, матрица собирается только если в кэше нет фрагмента
+    matrix_version = get_matrix_version()
     return render(request, template_name="products_list.html", context={
-        'products_with_restaurant_availability': products_with_restaurant_availability,
-        'restaurants': restaurants,
+        'matrix': SimpleLazyObject(lambda: get_availability_matrix(matrix_version)),
+        'matrix_version': matrix_version,
+        'matrix_timeout': settings.CACHE_ENTRY_TIMEOUT,
     })
 
 
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_restaurants(request):
     return render(request, template_name="restaurants_list.html", context={
-        'restaurants': Restaurant.objects.all(),
+        'restaurants': Restaurant.objects.select_related('load'),
     })
 
 
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_orders(request):
-    orders = Order.objects.prefetch_items()
+    # изменения, случившиеся пока строится страница, клиент получит при опросе
+    last_event_id = get_last_event_id()
+    filter_form = OrdersFilter(request.GET)
+    orders = Order.objects.unprocessed().in_keyset_order()
+    if filter_form.is_valid():
+        orders = filter_form.filter(orders)
+
+    cursor = load_orders_cursor(request.GET.get('after', ''))
+    if cursor:
+        orders = orders.after(*cursor)
+
+    page_size = settings.MANAGER_ORDERS_PAGE_SIZE
+    orders = list(orders.prefetch_items()[:page_size + 1])
+    next_page_query = None
+    if len(orders) > page_size:
+        orders = orders[:page_size]
+        next_page_query = request.GET.copy()
+        next_page_query['after'] = dump_orders_cursor(orders[-1])
+        next_page_query = next_page_query.urlencode()
+
+    first_page_query = request.GET.copy()
+    first_page_query.pop('after', None)
 
     return render(request, template_name='order_items.html', context={
-        'order_items': orders
+        'order_items': orders,
+        'filter_form': filter_form,
+        'next_page_query': next_page_query,
+        'first_page_query': first_page_query.urlencode(),
+        'is_first_page': cursor is None,
+        'last_event_id': last_event_id,
+        'poll_interval': settings.ORDER_EVENTS_POLL_INTERVAL,
+        'export_form': OrdersExportForm(),
     })
+
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def export_orders_view(request):
+    form = OrdersExportForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest(form.errors.as_text())
+
+    export_format = form.cleaned_data['format']
+    rows = export_orders(
+        export_format,
+        form.cleaned_data['date_from'],
+        form.cleaned_data['date_to'],
+        form.cleaned_data['source'],
+    )
+    response = StreamingHttpResponse(rows, content_type=EXPORT_FORMATS[export_format][1])
+    response['Content-Disposition'] = f'attachment; filename="orders.{export_format}"'
+    return response
+
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def order_changes(request):
+    try:
+        last_event_id = int(request.GET['after'])
+    except (KeyError, ValueError):
+        return HttpResponseBadRequest('after: нужен id последнего события')
+    response = JsonResponse(get_order_changes(last_event_id))
+    response['Cache-Control'] = 'no-cache'
+    return response
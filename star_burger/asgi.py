@@ -0,0 +1,18 @@
+"""
+ASGI config for Django project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Under ASGI the public API is served by the async views from foodcartapp.async_views.
+Serve only /api/ through it: Django 3.2 iterates streaming responses on the event loop,
+so the order export has to stay on WSGI workers (see README).
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+"""
+
+import os
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "star_burger.settings")
+os.environ.setdefault("ASYNC_API", "true")
+application = get_asgi_application()
@@ -17,6 +17,14 @@ DEBUG = env.bool('DEBUG', False)
 ALLOWED_HOSTS = env.list('ALLOWED_HOSTS', ['127.0.0.1', 'localhost'])
 
 YANDEX_KEY = env('YANDEX_KEY')
+GEOCODER_URL = env('GEOCODER_URL', 'https://geocode-maps.yandex.ru/1.x')
+GEOCODER_TIMEOUT = env.float('GEOCODER_TIMEOUT', 5)
+GEOCODER_MAX_WORKERS = env.int('GEOCODER_MAX_WORKERS', 8)
+GEOCODER_RATE_LIMIT = env.float('GEOCODER_RATE_LIMIT', 10)
+GEOCODER_RETRIES = env.int('GEOCODER_RETRIES', 3)
+GEOCODER_BACKOFF = env.float('GEOCODER_BACKOFF', 0.5)
+GEOCODER_CACHE_SIZE = env.int('GEOCODER_CACHE_SIZE', 10000)
+GEOCODER_CACHE_TTL = env.int('GEOCODER_CACHE_TTL', 60 * 60)
 
 POST_SERVER_ITEM_ACCESS_TOKEN = env('POST_SERVER_ITEM_ACCESS_TOKEN')
 
@@ -35,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'foodcartapp.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -83,6 +92,8 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'star_burger.wsgi.application'
+ASGI_APPLICATION = 'star_burger.asgi.application'
+ASYNC_API = env.bool('ASYNC_API', False)
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
@@ -91,6 +102,46 @@ DATABASES = {
     'default': dj_database_url.config(default=env('DB_URL'))
 }
 
+CACHES = {
+    'default': env.dj_cache_url('CACHE_URL', 'locmem://')
+}
+CACHE_ENTRY_TIMEOUT = env.int('CACHE_ENTRY_TIMEOUT', 5 * 60)
+
+RESTAURANT_INDEX_CELL_SIZE = env.float('RESTAURANT_INDEX_CELL_SIZE', 0.05)
+RESTAURANT_INDEX_TTL = env.int('RESTAURANT_INDEX_TTL', 10 * 60)
+PRODUCT_CATALOG_MAX_AGE = env.int('PRODUCT_CATALOG_MAX_AGE', 0)
+BANNERS_MAX_AGE = env.int('BANNERS_MAX_AGE', 0)
+NEAREST_RESTAURANTS_COUNT = env.int('NEAREST_RESTAURANTS_COUNT', 5)
+ORDERS_BATCH_MAX_SIZE = env.int('ORDERS_BATCH_MAX_SIZE', 1000)
+MANAGER_ORDERS_PAGE_SIZE = env.int('MANAGER_ORDERS_PAGE_SIZE', 50)
+DISPATCH_RESTAURANT_CAPACITY = env.int('DISPATCH_RESTAURANT_CAPACITY', 20)
+DISPATCH_LOAD_PENALTY_KM = env.float('DISPATCH_LOAD_PENALTY_KM', 0.5)
+ORDERS_ARCHIVE_AFTER_DAYS = env.int('ORDERS_ARCHIVE_AFTER_DAYS', 90)
+ORDER_EVENTS_POLL_INTERVAL = env.int('ORDER_EVENTS_POLL_INTERVAL', 5)
+ORDER_EVENTS_POLL_LIMIT = env.int('ORDER_EVENTS_POLL_LIMIT', 200)
+ORDER_EVENTS_RETENTION = env.int('ORDER_EVENTS_RETENTION', 60 * 60)
+METRICS_TOKEN = env.str('METRICS_TOKEN', '')
+METRICS_SLOW_REQUEST_SECONDS = env.float('METRICS_SLOW_REQUEST_SECONDS', 1)
+METRICS_SLOW_REQUEST_QUERIES = env.int('METRICS_SLOW_REQUEST_QUERIES', 100)
+METRICS_TOP_STATEMENTS = env.int('METRICS_TOP_STATEMENTS', 5)
+
+# без своего обработчика предупреждения перехватывает LoggingPanel debug_toolbar
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'foodcartapp': {
+            'handlers': ['console'],
+            'level': env('FOODCARTAPP_LOG_LEVEL', 'WARNING'),
+        },
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',